@@ -0,0 +1,62 @@
+import sqlite3
+
+HISTORY_COLUMNS = ("date_time", "run_id", "total_liquidity", "volume_weighted_price", "exchange_rate", "spread", "advertiser_count")
+
+
+def create_dashboard_history_table(cursor):
+    """Append-only copy of every dashboard row a run publishes.
+
+    Clustered on (fiat, time), so a fiat's window is one contiguous range
+    read however many months of runs the table holds.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS dashboard_history (
+            fiat_currency TEXT NOT NULL,
+            date_time TEXT NOT NULL,
+            run_id INTEGER NOT NULL,
+            total_liquidity REAL,
+            volume_weighted_price REAL,
+            exchange_rate REAL,
+            spread REAL,
+            advertiser_count INTEGER,
+            PRIMARY KEY (fiat_currency, date_time, run_id)
+        ) WITHOUT ROWID
+    """)
+
+
+def record_dashboard_history(cursor, run_id, fiat_currency):
+    """Append a fiat's freshly written dashboard row; call in the same transaction as update_dashboard."""
+    cursor.execute("""
+        INSERT OR REPLACE INTO dashboard_history (
+            fiat_currency, date_time, run_id, total_liquidity,
+            volume_weighted_price, exchange_rate, spread, advertiser_count
+        )
+        SELECT fiat_currency, date_time, ?, total_liquidity, volume_weighted_price, exchange_rate, spread, advertiser_count
+        FROM dashboard WHERE fiat_currency = ?
+    """, (run_id, fiat_currency))
+
+
+def read_dashboard_history(conn, fiat_currency, start=None, end=None, limit=None):
+    """A fiat's rows (HISTORY_COLUMNS order) between start and end, oldest first.
+
+    With a limit, the latest rows of the window are returned. Returns None
+    for databases written before the table existed.
+    """
+    conditions = ["fiat_currency = ?"]
+    params = [fiat_currency]
+    if start is not None:
+        conditions.append("date_time >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append("date_time <= ?")
+        params.append(end)
+    query = f"SELECT {', '.join(HISTORY_COLUMNS)} FROM dashboard_history WHERE {' AND '.join(conditions)} ORDER BY date_time DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    try:
+        rows = conn.execute(query, params).fetchall()
+    except sqlite3.OperationalError:
+        return None
+    return rows[::-1]
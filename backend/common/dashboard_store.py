@@ -0,0 +1,207 @@
+import gzip
+import json
+import sqlite3
+from datetime import datetime
+
+DASHBOARD_QUERY = "SELECT date_time, country, fiat_currency, total_liquidity, volume_weighted_price, exchange_rate, spread, available_payment_methods FROM dashboard"
+
+# Present once migrate_spread_column() has converted the spreads to numbers
+SPREAD_INDEX = "idx_dashboard_spread"
+
+
+def create_dashboard_tables(cursor):
+    """Scrape runs and the normalized per-method breakdown of each dashboard row."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scrape_runs (
+            run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at TEXT,
+            finished_at TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS payment_methods (
+            method_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS dashboard_payment_methods (
+            fiat_currency TEXT,
+            run_id INTEGER,
+            method_id INTEGER,
+            liquidity REAL,
+            vwap REAL,
+            PRIMARY KEY (fiat_currency, run_id, method_id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS dashboard_document (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            run_id INTEGER,
+            generated_at TEXT,
+            body BLOB,
+            body_gzip BLOB
+        )
+    """)
+
+
+def start_run(cursor):
+    """Register a scrape run and return its run_id."""
+    started_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    cursor.execute("INSERT INTO scrape_runs (started_at) VALUES (?)", (started_at,))
+    return cursor.lastrowid
+
+
+def finish_run(cursor, run_id):
+    finished_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    cursor.execute("UPDATE scrape_runs SET finished_at = ? WHERE run_id = ?", (finished_at, run_id))
+
+
+def get_method_ids(cursor, methods):
+    """{method name: method_id}, registering names seen for the first time."""
+    cursor.executemany("INSERT OR IGNORE INTO payment_methods (name) VALUES (?)", [(method,) for method in methods])
+    ids = {}
+    for method in methods:
+        cursor.execute("SELECT method_id FROM payment_methods WHERE name = ?", (method,))
+        ids[method] = cursor.fetchone()[0]
+    return ids
+
+
+def save_payment_method_stats(cursor, fiat_currency, run_id, per_method):
+    """Store a fiat's [(method, liquidity, vwap)] breakdown for a run."""
+    method_ids = get_method_ids(cursor, [method for method, _, _ in per_method])
+    cursor.executemany("""
+        INSERT OR REPLACE INTO dashboard_payment_methods (fiat_currency, run_id, method_id, liquidity, vwap)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(fiat_currency, run_id, method_ids[method], liquidity, vwap) for method, liquidity, vwap in per_method])
+
+
+def clear_payment_method_stats(cursor, fiat_currency):
+    cursor.execute("DELETE FROM dashboard_payment_methods WHERE fiat_currency = ?", (fiat_currency,))
+
+
+def read_payment_method_stats(conn, fiat_currency=None):
+    """{fiat: [(method, liquidity, vwap)]} in the order the scraper wrote them (largest first).
+
+    Limited to one fiat when fiat_currency is given. Returns None for
+    databases written before the table existed.
+    """
+    where = "" if fiat_currency is None else "WHERE p.fiat_currency = ?"
+    params = () if fiat_currency is None else (fiat_currency,)
+    try:
+        rows = conn.execute(f"""
+            SELECT p.fiat_currency, m.name, p.liquidity, p.vwap
+            FROM dashboard_payment_methods p
+            JOIN payment_methods m ON m.method_id = p.method_id
+            {where}
+            ORDER BY p.fiat_currency, p.rowid
+        """, params).fetchall()
+    except sqlite3.OperationalError:
+        return None
+
+    stats = {}
+    for fiat_currency, method, liquidity, vwap in rows:
+        stats.setdefault(fiat_currency, []).append((method, liquidity, vwap))
+    return stats
+
+
+def count_payment_methods(conn):
+    """Distinct payment methods across the current dashboard, or None for older databases."""
+    try:
+        return conn.execute("SELECT COUNT(DISTINCT method_id) FROM dashboard_payment_methods").fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+
+
+def spread_value(spread):
+    """Numeric spread from a dashboard value (4.16, or "4.16%" from older scrapers)."""
+    if isinstance(spread, str):
+        spread = spread.strip().rstrip('%')
+    return float(spread or 0)
+
+
+def migrate_spread_column(cursor):
+    """Convert "x.xx%" spreads written by older scrapers to numbers and index the column.
+
+    Also rewrites the stored dashboard document, so the API never serves text
+    spreads. Returns the number of rows converted.
+    """
+    cursor.execute("UPDATE dashboard SET spread = CAST(REPLACE(spread, '%', '') AS REAL) WHERE typeof(spread) = 'text'")
+    converted = cursor.rowcount
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {SPREAD_INDEX} ON dashboard (spread)")
+    if converted:
+        document = cursor.connection.execute("SELECT run_id FROM dashboard_document WHERE id = 1").fetchone()
+        if document is not None:
+            save_dashboard_document(cursor, document[0])
+    return converted
+
+
+def spread_expression(conn):
+    """SQL for the numeric spread: the indexed column once migrated, a per-row conversion before."""
+    migrated = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (SPREAD_INDEX,)).fetchone()
+    return "spread" if migrated else "CAST(REPLACE(spread, '%', '') AS REAL)"
+
+
+def parse_payment_methods_str(raw_payment_methods):
+    """Parse the legacy packed "Method (liquidity) (vwap), ..." string (databases written by older scrapers)."""
+    payment_methods_list = []
+    for method in raw_payment_methods.split(','):
+        method = method.strip()
+        if '(' in method and ')' in method:
+            parts = method.split('(')
+            method_name = parts[0].strip()
+            liquidity = parts[1].split(')')[0].strip()
+            vwap = parts[2].split(')')[0].strip() if len(parts) > 2 else None
+            payment_methods_list.append({"method": method_name, "liquidity": liquidity, "vwap": vwap})
+    return payment_methods_list
+
+
+def format_dashboard_row(row, method_stats):
+    """API representation of a DASHBOARD_QUERY row; method_stats is read_payment_method_stats() output."""
+    if method_stats is None or row[2] not in method_stats:
+        # Row written by an older scraper: only the packed string has its methods
+        payment_methods_list = parse_payment_methods_str(row[7] or "")
+    else:
+        payment_methods_list = [
+            {"method": method, "liquidity": f"{liquidity:.2f}", "vwap": f"{vwap:.2f}"}
+            for method, liquidity, vwap in method_stats.get(row[2], ())
+        ]
+
+    return {
+        "date_time": row[0][:16],  # "YYYY-MM-DD HH:MM"
+        "country": row[1],
+        "fiat_currency": row[2],
+        "total_liquidity": row[3],
+        "volume_weighted_price": row[4],
+        "exchange_rate": row[5],
+        "spread": spread_value(row[6]),
+        "available_payment_methods": payment_methods_list
+    }
+
+
+def save_dashboard_document(cursor, run_id):
+    """Store the whole /api/dashboard response, plain and gzipped, as of the current transaction.
+
+    Called in the same transaction as every dashboard change, so the API can
+    serve the blob as-is and it always matches the table.
+    """
+    conn = cursor.connection
+    rows = conn.execute(DASHBOARD_QUERY).fetchall()
+    method_stats = read_payment_method_stats(conn)
+    document = [format_dashboard_row(row, method_stats) for row in rows]
+
+    # Same encoding as jsonify: sorted keys, compact separators, trailing newline
+    body = (json.dumps(document, sort_keys=True, separators=(",", ":")) + "\n").encode()
+    generated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    cursor.execute("""
+        INSERT OR REPLACE INTO dashboard_document (id, run_id, generated_at, body, body_gzip)
+        VALUES (1, ?, ?, ?, ?)
+    """, (run_id, generated_at, body, gzip.compress(body, mtime=0)))
+
+
+def read_dashboard_document(conn):
+    """(body, body_gzip) of the stored dashboard document, or None if no scraper has written one."""
+    try:
+        return conn.execute("SELECT body, body_gzip FROM dashboard_document WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return None
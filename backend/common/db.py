@@ -0,0 +1,104 @@
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# How long a connection waits on a lock before raising "database is locked"
+BUSY_TIMEOUT_MS = 5000
+MMAP_SIZE = 256 * 1024 * 1024  # map up to 256 MB of the file instead of read() calls
+
+# Scrapers: WAL so readers keep reading the last commit while a fiat is written.
+# synchronous=NORMAL only fsyncs at checkpoints, which is safe in WAL mode.
+WRITER_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": BUSY_TIMEOUT_MS,
+    "mmap_size": MMAP_SIZE,
+    "journal_size_limit": 64 * 1024 * 1024,  # truncate the WAL back to 64 MB after checkpoints
+}
+
+# API: read-only connections that never take write locks
+READER_PRAGMAS = {
+    "query_only": "ON",
+    "busy_timeout": BUSY_TIMEOUT_MS,
+    "mmap_size": MMAP_SIZE,
+    "cache_size": -32000,  # ~32 MB page cache per connection (negative = KiB)
+    "temp_store": "MEMORY",
+}
+
+# Seconds between checkpoints while a scraper runs
+CHECKPOINT_INTERVAL = 60.0
+
+
+def apply_pragmas(conn, pragmas):
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+
+
+def connect_writer(db_path):
+    """Connection for a scraper; switches the file to WAL (a persistent setting) on first use."""
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+    apply_pragmas(conn, WRITER_PRAGMAS)
+    return conn
+
+
+def connect_reader(db_path, pragmas=READER_PRAGMAS):
+    """Read-only connection usable from any thread (callers serialize access, e.g. through a pool)."""
+    uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False, timeout=BUSY_TIMEOUT_MS / 1000)
+    apply_pragmas(conn, pragmas)
+    return conn
+
+
+def checkpoint(conn, mode="PASSIVE"):
+    """Copy WAL pages back into the database file; returns (busy, wal pages, pages checkpointed).
+
+    PASSIVE never waits on readers or the writer; TRUNCATE also empties the WAL
+    and is meant for when the scraper is done.
+    """
+    return conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+
+
+class CheckpointScheduler:
+    """Background thread checkpointing a database on its own connection every interval seconds.
+
+    Keeps the WAL short while a scraper holds long transactions, so readers
+    don't have to walk an ever-growing log.
+    """
+
+    def __init__(self, db_path, interval=CHECKPOINT_INTERVAL):
+        self.db_path = db_path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="wal-checkpoint", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    checkpoint(conn)
+                except sqlite3.Error as e:
+                    logger.warning(f"Checkpoint of {self.db_path} failed: {e}")
+        finally:
+            conn.close()
+
+    def stop(self, final_mode="TRUNCATE"):
+        """Stop the thread and run one last checkpoint (call after the scraper's final commit)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+        try:
+            return checkpoint(conn, final_mode)
+        except sqlite3.Error as e:
+            logger.warning(f"Final checkpoint of {self.db_path} failed: {e}")
+        finally:
+            conn.close()
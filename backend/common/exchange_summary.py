@@ -0,0 +1,126 @@
+import sqlite3
+from datetime import datetime
+from common.dashboard_store import get_method_ids, parse_payment_methods_str, spread_value
+
+
+def create_summary_tables(cursor):
+    """Exchange-wide totals behind /calculate, plus reference counts for its distinct countries and methods."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS exchange_summary (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_liquidity REAL,
+            spread_sum REAL,
+            dashboard_rows INTEGER,
+            country_count INTEGER,
+            payment_method_count INTEGER,
+            updated_at TEXT
+        )
+    """)
+    # Number of dashboard fiats using each country / method; a row goes away when its count reaches 0
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS summary_countries (
+            country TEXT PRIMARY KEY,
+            refs INTEGER
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS summary_payment_methods (
+            method_id INTEGER PRIMARY KEY,
+            refs INTEGER
+        )
+    """)
+
+
+def _fiat_contribution(cursor, fiat_currency):
+    """(liquidity, spread sum, rows, countries, method ids) of a fiat's current dashboard rows."""
+    conn = cursor.connection
+    rows = conn.execute(
+        "SELECT country, total_liquidity, spread, available_payment_methods FROM dashboard WHERE fiat_currency = ?",
+        (fiat_currency,)
+    ).fetchall()
+    method_ids = [method_id for (method_id,) in conn.execute(
+        "SELECT DISTINCT method_id FROM dashboard_payment_methods WHERE fiat_currency = ?", (fiat_currency,)
+    )]
+    if rows and not method_ids:
+        # Rows written by older scrapers only have the packed string
+        names = {method["method"] for row in rows for method in parse_payment_methods_str(row[3] or "")}
+        method_ids = list(get_method_ids(cursor, sorted(names)).values())
+
+    liquidity = sum(row[1] or 0 for row in rows)
+    spread_sum = sum(spread_value(row[2]) for row in rows)
+    countries = {row[0] or "" for row in rows}  # fiats without a known country count as one
+    return liquidity, spread_sum, len(rows), countries, method_ids
+
+
+def _apply_contribution(cursor, contribution, sign):
+    liquidity, spread_sum, rows, countries, method_ids = contribution
+    cursor.executemany("""
+        INSERT INTO summary_countries (country, refs) VALUES (?, ?)
+        ON CONFLICT (country) DO UPDATE SET refs = refs + excluded.refs
+    """, [(country, sign) for country in countries])
+    cursor.executemany("""
+        INSERT INTO summary_payment_methods (method_id, refs) VALUES (?, ?)
+        ON CONFLICT (method_id) DO UPDATE SET refs = refs + excluded.refs
+    """, [(method_id, sign) for method_id in method_ids])
+    if sign < 0:
+        cursor.execute("DELETE FROM summary_countries WHERE refs <= 0")
+        cursor.execute("DELETE FROM summary_payment_methods WHERE refs <= 0")
+
+    updated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    cursor.execute("""
+        INSERT INTO exchange_summary (id, total_liquidity, spread_sum, dashboard_rows, country_count, payment_method_count, updated_at)
+        VALUES (1, ?, ?, ?, (SELECT COUNT(*) FROM summary_countries), (SELECT COUNT(*) FROM summary_payment_methods), ?)
+        ON CONFLICT (id) DO UPDATE SET
+            total_liquidity = total_liquidity + excluded.total_liquidity,
+            spread_sum = spread_sum + excluded.spread_sum,
+            dashboard_rows = dashboard_rows + excluded.dashboard_rows,
+            country_count = excluded.country_count,
+            payment_method_count = excluded.payment_method_count,
+            updated_at = excluded.updated_at
+    """, (sign * liquidity, sign * spread_sum, sign * rows, updated_at))
+
+
+def add_fiat_to_summary(cursor, fiat_currency):
+    """Add a fiat's dashboard row to the summary; call after writing the row and its method stats."""
+    _apply_contribution(cursor, _fiat_contribution(cursor, fiat_currency), 1)
+
+
+def remove_fiat_from_summary(cursor, fiat_currency):
+    """Subtract a fiat's dashboard row from the summary; call before deleting the row and its method stats."""
+    _apply_contribution(cursor, _fiat_contribution(cursor, fiat_currency), -1)
+
+
+def rebuild_exchange_summary(cursor):
+    """Recompute the summary from the whole dashboard.
+
+    Run when a scraper starts, which also bootstraps databases written before
+    the table existed and resets any float drift from incremental updates.
+    """
+    cursor.execute("DELETE FROM exchange_summary")
+    cursor.execute("DELETE FROM summary_countries")
+    cursor.execute("DELETE FROM summary_payment_methods")
+    fiats = [fiat for (fiat,) in cursor.connection.execute("SELECT DISTINCT fiat_currency FROM dashboard")]
+    _apply_contribution(cursor, (0, 0, 0, (), ()), 1)
+    for fiat_currency in fiats:
+        add_fiat_to_summary(cursor, fiat_currency)
+
+
+def read_exchange_summary(conn):
+    """/calculate metrics from the summary row, or None if no scraper has written one."""
+    try:
+        row = conn.execute("""
+            SELECT total_liquidity, spread_sum, dashboard_rows, country_count, payment_method_count
+            FROM exchange_summary WHERE id = 1
+        """).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    if row is None:
+        return None
+
+    total_liquidity, spread_sum, dashboard_rows, country_count, payment_method_count = row
+    return {
+        'total_liquidity': total_liquidity,
+        'average_spread': spread_sum / dashboard_rows if dashboard_rows else 0,
+        'total_countries': country_count,
+        'unique_payment_methods_count': payment_method_count
+    }
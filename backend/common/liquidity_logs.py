@@ -0,0 +1,294 @@
+import sqlite3
+from datetime import datetime, timezone
+
+# Bucket sizes (seconds) kept as rollups, coarsest first
+ROLLUP_SIZES = (86400, 3600)
+
+# Aggregates a bucket of logged values can be reduced to
+ROLLUP_STATS = ("avg", "min", "max", "last")
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def parse_timestamp(timestamp):
+    """datetime of a logged timestamp; older wide-table rows lack zero padding ("2024-09-28 2:21:26")."""
+    return datetime.strptime(timestamp, TIMESTAMP_FORMAT)
+
+
+def normalize_timestamp(timestamp):
+    return parse_timestamp(timestamp).strftime(TIMESTAMP_FORMAT)
+
+
+def create_liquidity_logs_tables(cursor):
+    """Per-run liquidity logs, one row per (run, fiat) instead of one column per country."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS log_runs (
+            run_id INTEGER PRIMARY KEY,
+            timestamp TEXT NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_log_runs_timestamp ON log_runs (timestamp)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS liquidity_logs (
+            run_id INTEGER NOT NULL,
+            fiat_currency TEXT NOT NULL,
+            liquidity REAL,
+            PRIMARY KEY (run_id, fiat_currency)
+        ) WITHOUT ROWID
+    """)
+    # One fiat's values across runs, for per-country reads
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_liquidity_logs_fiat ON liquidity_logs (fiat_currency, run_id)")
+
+    # Hourly and daily min/max/sum/count/last per fiat, updated as each run is logged
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS liquidity_rollups (
+            bucket_seconds INTEGER NOT NULL,
+            bucket TEXT NOT NULL,
+            fiat_currency TEXT NOT NULL,
+            min_liquidity REAL,
+            max_liquidity REAL,
+            sum_liquidity REAL,
+            samples INTEGER,
+            last_liquidity REAL,
+            last_at TEXT,
+            PRIMARY KEY (bucket_seconds, bucket, fiat_currency)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_liquidity_rollups_fiat ON liquidity_rollups (bucket_seconds, fiat_currency, bucket)")
+    # Databases whose logs predate the rollups get them built once
+    conn = cursor.connection
+    if conn.execute("SELECT 1 FROM liquidity_rollups LIMIT 1").fetchone() is None:
+        rebuild_liquidity_rollups(cursor)
+
+
+def save_liquidity_logs(cursor, run_id, timestamp, liquidity_by_fiat):
+    """Log the {fiat: total liquidity} of the fiats a run processed and fold it into the rollups."""
+    cursor.execute("INSERT OR REPLACE INTO log_runs (run_id, timestamp) VALUES (?, ?)", (run_id, timestamp))
+    cursor.executemany(
+        "INSERT OR REPLACE INTO liquidity_logs (run_id, fiat_currency, liquidity) VALUES (?, ?, ?)",
+        [(run_id, fiat_currency, liquidity) for fiat_currency, liquidity in liquidity_by_fiat.items()]
+    )
+    update_liquidity_rollups(cursor, [(timestamp, fiat_currency, liquidity) for fiat_currency, liquidity in liquidity_by_fiat.items()])
+
+
+def rollup_bucket(timestamp, bucket_seconds):
+    """Start of the bucket_seconds bucket holding a logged timestamp."""
+    return _timestamp(_epoch(timestamp) // bucket_seconds * bucket_seconds)
+
+
+def update_liquidity_rollups(cursor, samples):
+    """Add (timestamp, fiat, liquidity) samples to every rollup bucket they fall in."""
+    # A run's samples share one timestamp, so each is parsed once
+    buckets = {}
+    for timestamp, _, _ in samples:
+        if timestamp not in buckets:
+            buckets[timestamp] = {bucket_seconds: rollup_bucket(timestamp, bucket_seconds) for bucket_seconds in ROLLUP_SIZES}
+    cursor.executemany("""
+        INSERT INTO liquidity_rollups (
+            bucket_seconds, bucket, fiat_currency, min_liquidity, max_liquidity,
+            sum_liquidity, samples, last_liquidity, last_at
+        )
+        VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?)
+        ON CONFLICT (bucket_seconds, bucket, fiat_currency) DO UPDATE SET
+            min_liquidity = MIN(min_liquidity, excluded.min_liquidity),
+            max_liquidity = MAX(max_liquidity, excluded.max_liquidity),
+            sum_liquidity = sum_liquidity + excluded.sum_liquidity,
+            samples = samples + 1,
+            last_liquidity = CASE WHEN excluded.last_at >= last_at THEN excluded.last_liquidity ELSE last_liquidity END,
+            last_at = MAX(last_at, excluded.last_at)
+    """, [
+        (bucket_seconds, buckets[timestamp][bucket_seconds], fiat_currency, liquidity, liquidity, liquidity, liquidity, timestamp)
+        for timestamp, fiat_currency, liquidity in samples
+        for bucket_seconds in ROLLUP_SIZES
+    ])
+
+
+def rebuild_liquidity_rollups(cursor):
+    """Recompute every rollup from liquidity_logs."""
+    cursor.execute("DELETE FROM liquidity_rollups")
+    samples = cursor.connection.execute("""
+        SELECT r.timestamp, l.fiat_currency, l.liquidity
+        FROM log_runs r JOIN liquidity_logs l ON l.run_id = r.run_id
+        ORDER BY r.timestamp
+    """)
+    while True:
+        batch = samples.fetchmany(5000)
+        if not batch:
+            break
+        update_liquidity_rollups(cursor, batch)
+
+
+def migrate_wide_logs(cursor, fiat_to_country):
+    """Copy rows of the old one-column-per-country logs table into the long tables.
+
+    Each wide row becomes a scrape run of its own, its timestamp normalized
+    to TIMESTAMP_FORMAT (rows with unparsable timestamps are skipped). Rows
+    already copied are skipped, so this is safe to run on every start. Zero
+    cells (fiats a run didn't process) and columns for countries missing
+    from fiat_to_country are dropped. The wide table is left in place.
+    Returns the number of rows copied.
+    """
+    conn = cursor.connection
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'logs'").fetchone() is None:
+        return 0
+    _normalize_copied_timestamps(cursor)
+
+    # First fiat wins when two fiats map to the same country
+    country_to_fiat = {}
+    for fiat_currency, country in fiat_to_country.items():
+        country_to_fiat.setdefault(country, fiat_currency)
+
+    copied_timestamps = {timestamp for (timestamp,) in conn.execute("SELECT timestamp FROM log_runs")}
+    rows = conn.execute("SELECT * FROM logs")
+    columns = [column[0] for column in rows.description]
+    timestamp_idx = columns.index("timestamp")
+    pending = []
+    for row in rows.fetchall():
+        try:
+            timestamp = normalize_timestamp(row[timestamp_idx])
+        except (TypeError, ValueError):
+            continue
+        if timestamp not in copied_timestamps:
+            copied_timestamps.add(timestamp)
+            pending.append((timestamp, row))
+
+    copied = 0
+    for timestamp, row in sorted(pending, key=lambda item: item[0]):
+        cursor.execute("INSERT INTO scrape_runs (started_at, finished_at) VALUES (?, ?)", (timestamp, timestamp))
+        liquidity_by_fiat = {
+            country_to_fiat[column]: value
+            for column, value in zip(columns, row)
+            if column in country_to_fiat and value
+        }
+        save_liquidity_logs(cursor, cursor.lastrowid, timestamp, liquidity_by_fiat)
+        copied += 1
+    return copied
+
+
+def _normalize_copied_timestamps(cursor):
+    """Pad timestamps of runs copied before migrate_wide_logs normalized them, and redo the rollups if any changed."""
+    conn = cursor.connection
+    runs = conn.execute("SELECT run_id, timestamp FROM log_runs WHERE length(timestamp) != 19").fetchall()
+    repaired = []
+    for run_id, timestamp in runs:
+        try:
+            repaired.append((normalize_timestamp(timestamp), run_id))
+        except ValueError:
+            continue
+    if not repaired:
+        return
+    cursor.executemany("UPDATE log_runs SET timestamp = ? WHERE run_id = ?", repaired)
+    cursor.executemany("UPDATE scrape_runs SET started_at = ?1, finished_at = ?1 WHERE run_id = ?2", repaired)
+    rebuild_liquidity_rollups(cursor)
+
+
+def read_liquidity_logs(conn, conditions, params, limit, fiats=None):
+    """[(timestamp, {fiat: liquidity})] of the latest `limit` logged runs, newest first.
+
+    conditions are SQL filters on log_runs.timestamp; fiats limits which
+    values are read. Returns None for databases that only have the old wide
+    logs table.
+    """
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    fiat_filter = "" if fiats is None else f"AND l.fiat_currency IN ({', '.join('?' * len(fiats))})"
+    try:
+        rows = conn.execute(f"""
+            SELECT r.run_id, r.timestamp, l.fiat_currency, l.liquidity
+            FROM (SELECT run_id, timestamp FROM log_runs {where} ORDER BY timestamp DESC LIMIT ?) r
+            LEFT JOIN liquidity_logs l ON l.run_id = r.run_id {fiat_filter}
+            ORDER BY r.timestamp DESC, r.run_id
+        """, [*params, limit, *(fiats or ())]).fetchall()
+    except sqlite3.OperationalError:
+        return None
+
+    runs = {}
+    for run_id, timestamp, fiat_currency, liquidity in rows:
+        _, values = runs.setdefault(run_id, (timestamp, {}))
+        if fiat_currency is not None:
+            values[fiat_currency] = liquidity
+    return list(runs.values())
+
+
+def _epoch(timestamp):
+    return int(parse_timestamp(timestamp).replace(tzinfo=timezone.utc).timestamp())
+
+
+def _timestamp(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def read_liquidity_series(conn, bucket_seconds, limit, start=None, end=None, before=None, fiats=None, stat="avg"):
+    """[(bucket start, {fiat: stat})] of the latest `limit` buckets of bucket_seconds, newest first.
+
+    Reads the coarsest rollup whose size divides bucket_seconds and merges
+    its buckets; sizes under an hour are grouped from the raw logs. start
+    is widened to the start of its bucket. Returns None for databases
+    without the long-format logs.
+    """
+    source = next((size for size in ROLLUP_SIZES if bucket_seconds % size == 0), None)
+    if start is not None:
+        start = _timestamp(_epoch(start) // bucket_seconds * bucket_seconds)
+
+    if source is None:
+        column = "r.timestamp"
+        query = """
+            SELECT r.timestamp, l.fiat_currency, l.liquidity, l.liquidity, l.liquidity, 1, l.liquidity
+            FROM log_runs r JOIN liquidity_logs l ON l.run_id = r.run_id
+        """
+        conditions = []
+        params = []
+    else:
+        column = "bucket"
+        # Without the hint, an IN list over fiats makes the planner walk every fiat's buckets in key order
+        index = "" if fiats is None else "INDEXED BY idx_liquidity_rollups_fiat"
+        query = f"""
+            SELECT bucket, fiat_currency, min_liquidity, max_liquidity, sum_liquidity, samples, last_liquidity
+            FROM liquidity_rollups {index}
+        """
+        conditions = ["bucket_seconds = ?"]
+        params = [source]
+    for operator, value in ((">=", start), ("<=", end), ("<", before)):
+        if value is not None:
+            conditions.append(f"{column} {operator} ?")
+            params.append(value)
+    if fiats is not None:
+        conditions.append(f"fiat_currency IN ({', '.join('?' * len(fiats))})")
+        params.extend(fiats)
+    if conditions:
+        query += f" WHERE {' AND '.join(conditions)}"
+
+    try:
+        rows = conn.execute(f"{query} ORDER BY {column} DESC", params)
+    except sqlite3.OperationalError:
+        return None
+
+    # Rollup buckets of exactly the requested size are used as they are
+    regroup = bucket_seconds != source
+    # Rows arrive newest first, so the first one seen for a (bucket, fiat) holds its last value
+    buckets = {}
+    previous_time = None
+    for time, fiat_currency, low, high, total, count, last in rows:
+        if time != previous_time:
+            previous_time = time
+            slot = _epoch(time) // bucket_seconds * bucket_seconds if regroup else time
+        if slot not in buckets:
+            if len(buckets) == limit:
+                break
+            buckets[slot] = {}
+        merged = buckets[slot].get(fiat_currency)
+        if merged is None:
+            buckets[slot][fiat_currency] = [low, high, total, count, last]
+        else:
+            merged[0] = min(merged[0], low)
+            merged[1] = max(merged[1], high)
+            merged[2] += total
+            merged[3] += count
+
+    def reduce(merged):
+        low, high, total, count, last = merged
+        return {"avg": total / count if count else 0, "min": low, "max": high, "last": last}[stat]
+
+    return [
+        (_timestamp(slot) if regroup else slot, {fiat_currency: reduce(merged) for fiat_currency, merged in values.items()})
+        for slot, values in buckets.items()
+    ]
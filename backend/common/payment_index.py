@@ -0,0 +1,161 @@
+import sqlite3
+import numpy as np
+
+BANK_TRANSFER = "Bank Transfer"
+
+
+def canonical_method(method):
+    """Name a method is reported under in per-method stats; every "bank" method is grouped as "Bank Transfer"."""
+    method = method.strip()
+    if "bank" in method.lower():
+        return BANK_TRANSFER
+    return method
+
+
+def split_methods(methods_str):
+    """Stripped, de-duplicated methods of one ad's "A, B, C" payment methods string."""
+    methods = []
+    for method in (methods_str or "").split(","):
+        method = method.strip()
+        if method and method not in methods:
+            methods.append(method)
+    return methods
+
+
+class MethodIndex:
+    """Per-fiat payment method dictionary: bit i of an ad's mask means methods[i]."""
+
+    def __init__(self, methods):
+        self.methods = list(methods)
+        self.bits = {method: bit for bit, method in enumerate(self.methods)}
+        # Every bank method, which a "Bank Transfer" query also matches
+        self.bank_mask = sum(1 << bit for bit, method in enumerate(self.methods) if "bank" in method.lower())
+        # Masks are stored as fixed-width little-endian blobs (Binance USD alone has 70+ methods)
+        self.width = max(1, (len(self.methods) + 7) // 8)
+
+    @classmethod
+    def build(cls, payment_methods):
+        """Build the dictionary from a fiat's payment method strings, in order of first use."""
+        seen = {}
+        for methods_str in payment_methods:
+            for method in split_methods(methods_str):
+                seen.setdefault(method, None)
+        return cls(seen)
+
+    def encode(self, methods_str):
+        mask = 0
+        for method in split_methods(methods_str):
+            mask |= 1 << self.bits[method]
+        return mask
+
+    def encode_blob(self, methods_str):
+        return self.encode(methods_str).to_bytes(self.width, "little")
+
+    def query_mask(self, methods):
+        """Mask for a set of requested methods; methods this fiat has never seen are ignored.
+
+        Methods match by exact name, so one bank only selects its own ads;
+        "Bank Transfer" selects every bank method.
+        """
+        mask = 0
+        for method in methods:
+            method = method.strip()
+            bit = self.bits.get(method)
+            if bit is not None:
+                mask |= 1 << bit
+            if method == BANK_TRANSFER:
+                mask |= self.bank_mask
+        return np.frombuffer(mask.to_bytes(self.width, "little"), dtype=np.uint8)
+
+    def groups(self):
+        """(group names, group of each bit) for per-method stats, with the bank methods in one group."""
+        names = {}
+        group_of = [names.setdefault(canonical_method(method), len(names)) for method in self.methods]
+        return list(names), np.array(group_of, dtype=np.intp)
+
+    def mask_matrix(self, blobs):
+        """Stack per-ad mask blobs into an (ads x width) uint8 matrix."""
+        return np.frombuffer(b"".join(blobs), dtype=np.uint8).reshape(len(blobs), self.width)
+
+
+def ensure_mask_column(cursor, fiat_currency):
+    """Add the method_mask column to fiat tables created before the index existed."""
+    columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({fiat_currency})")]
+    if "method_mask" not in columns:
+        cursor.execute(f"ALTER TABLE {fiat_currency} ADD COLUMN method_mask BLOB")
+
+
+def save_method_index(cursor, fiat_currency, method_index):
+    """Replace the stored payment method dictionary for a fiat."""
+    # payment_method_index held dictionaries with the bank methods folded together; it is no longer read
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS payment_method_dictionary (
+            fiat_currency TEXT,
+            bit INTEGER,
+            method TEXT,
+            PRIMARY KEY (fiat_currency, bit)
+        )
+    """)
+    cursor.execute("DELETE FROM payment_method_dictionary WHERE fiat_currency = ?", (fiat_currency,))
+    cursor.executemany(
+        "INSERT INTO payment_method_dictionary (fiat_currency, bit, method) VALUES (?, ?, ?)",
+        [(fiat_currency, bit, method) for bit, method in enumerate(method_index.methods)]
+    )
+
+
+def load_method_index(conn, fiat_currency):
+    """Stored dictionary for a fiat, or None if the scraper hasn't written one."""
+    try:
+        rows = conn.execute(
+            "SELECT method FROM payment_method_dictionary WHERE fiat_currency = ? ORDER BY bit",
+            (fiat_currency,)
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return None
+    return MethodIndex(row[0] for row in rows) if rows else None
+
+
+def read_fiat_masks(conn, fiat_currency):
+    """Load a fiat table as (prices, amounts, masks, method_index) arrays.
+
+    Uses the ingest-time masks when the table has them and falls back to
+    encoding the payment method strings for tables written by older scrapers.
+    All reads share one read transaction, so a scraper publishing the fiat
+    in between can't pair one run's dictionary with another run's masks.
+    """
+    conn.execute("BEGIN")
+    try:
+        return _read_fiat_masks(conn, fiat_currency)
+    finally:
+        conn.execute("COMMIT")
+
+
+def _read_fiat_masks(conn, fiat_currency):
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({fiat_currency})")]
+    if not columns:
+        raise sqlite3.OperationalError(f"no such table: {fiat_currency}")
+
+    method_index = load_method_index(conn, fiat_currency) if "method_mask" in columns else None
+    if method_index is not None:
+        rows = conn.execute(f"SELECT price, available_amount, method_mask FROM {fiat_currency}").fetchall()
+        blobs = [row[2] for row in rows]
+        if not all(blob is not None and len(blob) == method_index.width for blob in blobs):
+            method_index = None
+
+    if method_index is None:
+        rows = conn.execute(f"SELECT price, available_amount, payment_methods FROM {fiat_currency}").fetchall()
+        method_index = MethodIndex.build(row[2] for row in rows)
+        blobs = [method_index.encode_blob(row[2]) for row in rows]
+
+    prices = np.array([row[0] for row in rows], dtype=np.float64)
+    amounts = np.array([row[1] for row in rows], dtype=np.float64)
+    return prices, amounts, method_index.mask_matrix(blobs), method_index
+
+
+def liquidity_for_methods(prices, amounts, masks, query_mask):
+    """Total liquidity and VWAP of the ads that accept any of the masked methods."""
+    selected = (masks & query_mask).any(axis=1)
+    total_liquidity = float(amounts[selected].sum())
+    weighted_price_sum = float(prices[selected] @ amounts[selected])
+    vwap = weighted_price_sum / total_liquidity if total_liquidity > 0 else 0
+    return total_liquidity, vwap
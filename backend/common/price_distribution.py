@@ -0,0 +1,107 @@
+import json
+import sqlite3
+import numpy as np
+from common.dashboard_store import get_method_ids
+
+# Liquidity-weighted price percentiles kept per fiat and method
+QUANTILES = (5, 25, 50, 75, 95)
+
+# Equal-width price bins between a fiat's cheapest and dearest ad
+HISTOGRAM_BINS = 20
+
+QUANTILE_COLUMNS = tuple(f"p{q}" for q in QUANTILES)
+
+
+def create_price_distribution_table(cursor):
+    """Price quantiles and histogram of each fiat's latest ads, overall (method_id 0) and per method."""
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS price_distributions (
+            fiat_currency TEXT NOT NULL,
+            method_id INTEGER NOT NULL,
+            run_id INTEGER,
+            position INTEGER,
+            ads INTEGER,
+            liquidity REAL,
+            {', '.join(f'{column} REAL' for column in QUANTILE_COLUMNS)},
+            histogram_min REAL,
+            bin_width REAL,
+            histogram TEXT,
+            PRIMARY KEY (fiat_currency, method_id)
+        ) WITHOUT ROWID
+    """)
+
+
+def _describe(ladder, edges):
+    return {
+        "ads": len(ladder),
+        "liquidity": ladder.total(),
+        "quantiles": dict(zip(QUANTILE_COLUMNS, ladder.quantiles(np.array(QUANTILES) / 100).tolist())),
+        "histogram": {
+            "min": float(edges[0]),
+            "bin_width": float(edges[1] - edges[0]),
+            "liquidity": ladder.histogram(edges).tolist()
+        }
+    }
+
+
+def price_distributions(snapshot):
+    """[(method, distribution)] of a FiatSnapshot: all ads first (method None), then each method by liquidity.
+
+    Every histogram of a fiat uses the same bins, so methods can be drawn
+    on one axis.
+    """
+    overall = snapshot.depth_ladder()
+    if not len(overall):
+        return []
+    edges = np.linspace(overall.prices[0], overall.prices[-1], HISTOGRAM_BINS + 1)
+    return [(method, _describe(ladder, edges)) for method, ladder in [(None, overall)] + snapshot.method_ladders()]
+
+
+def save_price_distributions(cursor, fiat_currency, run_id, distributions):
+    """Store price_distributions() of a fiat's freshly scraped ads."""
+    method_ids = get_method_ids(cursor, [method for method, _ in distributions if method is not None])
+    cursor.executemany(f"""
+        INSERT OR REPLACE INTO price_distributions (
+            fiat_currency, method_id, run_id, position, ads, liquidity,
+            {', '.join(QUANTILE_COLUMNS)}, histogram_min, bin_width, histogram
+        )
+        VALUES ({', '.join('?' * (9 + len(QUANTILE_COLUMNS)))})
+    """, [
+        (
+            fiat_currency, 0 if method is None else method_ids[method], run_id, position,
+            distribution["ads"], distribution["liquidity"], *distribution["quantiles"].values(),
+            distribution["histogram"]["min"], distribution["histogram"]["bin_width"],
+            json.dumps(distribution["histogram"]["liquidity"])
+        )
+        for position, (method, distribution) in enumerate(distributions)
+    ])
+
+
+def clear_price_distributions(cursor, fiat_currency):
+    cursor.execute("DELETE FROM price_distributions WHERE fiat_currency = ?", (fiat_currency,))
+
+
+def read_price_distributions(conn, fiat_currency):
+    """A fiat's stored [(method, distribution)] in price_distributions() order.
+
+    Returns None for databases written before the table existed.
+    """
+    try:
+        rows = conn.execute(f"""
+            SELECT m.name, d.ads, d.liquidity, {', '.join(f'd.{column}' for column in QUANTILE_COLUMNS)},
+                   d.histogram_min, d.bin_width, d.histogram
+            FROM price_distributions d
+            LEFT JOIN payment_methods m ON m.method_id = d.method_id
+            WHERE d.fiat_currency = ?
+            ORDER BY d.position
+        """, (fiat_currency,)).fetchall()
+    except sqlite3.OperationalError:
+        return None
+
+    quantiles_end = 3 + len(QUANTILE_COLUMNS)
+    return [(row[0], {
+        "ads": row[1],
+        "liquidity": row[2],
+        "quantiles": dict(zip(QUANTILE_COLUMNS, row[3:quantiles_end])),
+        "histogram": {"min": row[quantiles_end], "bin_width": row[quantiles_end + 1], "liquidity": json.loads(row[quantiles_end + 2])}
+    }) for row in rows]
@@ -0,0 +1,39 @@
+import sqlite3
+from datetime import datetime
+
+
+def create_scrape_events_table(cursor):
+    """One row per committed fiat (and one with fiat_currency NULL when a run finishes)."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scrape_events (
+            event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id INTEGER,
+            fiat_currency TEXT,
+            created_at TEXT
+        )
+    """)
+
+
+def emit_scrape_event(cursor, run_id, fiat_currency=None):
+    """Announce new data for a fiat (or the end of a run when fiat_currency is None).
+
+    Written in the same transaction as the data, so readers see the event
+    exactly when the scraper's commit lands.
+    """
+    created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    cursor.execute("INSERT INTO scrape_events (run_id, fiat_currency, created_at) VALUES (?, ?, ?)", (run_id, fiat_currency, created_at))
+
+
+def read_scrape_events(conn, after_event_id=0, limit=None):
+    """[(event_id, run_id, fiat_currency, created_at)] after an event id, oldest first.
+
+    With a limit and no after_event_id, returns the latest events. Databases
+    written before the table existed have no events.
+    """
+    try:
+        if limit is not None and not after_event_id:
+            rows = conn.execute("SELECT event_id, run_id, fiat_currency, created_at FROM scrape_events ORDER BY event_id DESC LIMIT ?", (limit,)).fetchall()
+            return rows[::-1]
+        return conn.execute("SELECT event_id, run_id, fiat_currency, created_at FROM scrape_events WHERE event_id > ? ORDER BY event_id", (after_event_id,)).fetchall()
+    except sqlite3.OperationalError:
+        return []
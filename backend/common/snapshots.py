@@ -0,0 +1,169 @@
+import numpy as np
+from common.payment_index import MethodIndex, read_fiat_masks, liquidity_for_methods
+
+# Depth ladders kept per snapshot (one per requested method set) before the cache is reset
+LADDER_CACHE_SIZE = 64
+
+
+class DepthLadder:
+    """Ads sorted by price (cheapest first) with running amount and notional totals.
+
+    Depth and fill questions become binary searches over the running totals,
+    answered for a whole array of prices or amounts at once.
+    """
+
+    def __init__(self, prices, amounts):
+        order = np.argsort(prices, kind="stable")
+        self.prices = prices[order]
+        amounts = amounts[order]
+        # Running totals with a leading 0, so index i is the total of the i cheapest ads
+        self.cumulative_amount = np.concatenate(([0.0], np.cumsum(amounts)))
+        self.cumulative_notional = np.concatenate(([0.0], np.cumsum(self.prices * amounts)))
+
+    def __len__(self):
+        return len(self.prices)
+
+    def total(self):
+        return float(self.cumulative_amount[-1])
+
+    def best_price(self):
+        return float(self.prices[0]) if len(self) else 0.0
+
+    def depth_at(self, prices):
+        """(amount, average price) of the ads priced at or below each price."""
+        counts = np.searchsorted(self.prices, np.asarray(prices, dtype=np.float64), side="right")
+        amount = self.cumulative_amount[counts]
+        notional = self.cumulative_notional[counts]
+        average = np.divide(notional, amount, out=np.zeros(len(counts)), where=amount > 0)
+        return amount, average
+
+    def fill(self, amounts):
+        """(filled, average price, worst price) of buying each amount from the cheapest ads up.
+
+        Amounts beyond the ladder's total are filled as far as it goes.
+        """
+        filled = np.minimum(np.asarray(amounts, dtype=np.float64), self.total())
+        if not len(self):
+            zeros = np.zeros(len(filled))
+            return filled, zeros, zeros
+        # Ad that completes each fill: the first whose running total reaches the amount
+        last = np.clip(np.searchsorted(self.cumulative_amount, filled, side="left") - 1, 0, len(self) - 1)
+        worst = self.prices[last]
+        cost = self.cumulative_notional[last] + (filled - self.cumulative_amount[last]) * worst
+        average = np.divide(cost, filled, out=np.zeros(len(filled)), where=filled > 0)
+        return filled, average, np.where(filled > 0, worst, 0.0)
+
+    def quantiles(self, fractions):
+        """Liquidity-weighted price quantiles: the price at which each fraction of the ladder's amount is reached."""
+        if not len(self):
+            return np.zeros(len(fractions))
+        targets = np.asarray(fractions, dtype=np.float64) * self.total()
+        last = np.clip(np.searchsorted(self.cumulative_amount, targets, side="left") - 1, 0, len(self) - 1)
+        return self.prices[last]
+
+    def histogram(self, edges):
+        """Amount of the ads in each [edge, next edge) price bin; the last bin includes its upper edge."""
+        counts = np.searchsorted(self.prices, edges[1:-1], side="left")
+        return np.diff(self.cumulative_amount[np.concatenate(([0], counts, [len(self)]))])
+
+    def levels(self, count):
+        """(price, amount, cumulative amount) of the `count` cheapest distinct price levels."""
+        ends = np.flatnonzero(np.diff(self.prices, append=np.inf))[:count]
+        cumulative = self.cumulative_amount[ends + 1]
+        return self.prices[ends], np.diff(cumulative, prepend=0.0), cumulative
+
+
+class FiatSnapshot:
+    """Columnar in-memory copy of one fiat's ads; all aggregates are NumPy reductions."""
+
+    def __init__(self, prices, amounts, masks, method_index):
+        self.prices = prices
+        self.amounts = amounts
+        self.masks = masks
+        self.method_index = method_index
+        self.notional = prices * amounts
+
+        # Flattened (ad, method group) pairs, one per group an ad accepts; an ad's bank methods count once
+        methods_count = len(method_index.methods)
+        membership = np.unpackbits(masks, axis=1, bitorder="little")[:, :methods_count]
+        self.method_groups, group_of = method_index.groups()
+        grouping = np.zeros((methods_count, len(self.method_groups)), dtype=np.uint16)
+        grouping[np.arange(methods_count), group_of] = 1
+        self.method_rows, self.method_ids = np.nonzero(membership.astype(np.uint16) @ grouping)
+        self._ladders = {}
+
+    @classmethod
+    def from_lists(cls, prices, available_amounts, payment_methods):
+        """Build from the scrapers' per-ad lists."""
+        method_index = MethodIndex.build(payment_methods)
+        masks = method_index.mask_matrix([method_index.encode_blob(methods) for methods in payment_methods])
+        return cls(np.array(prices, dtype=np.float64), np.array(available_amounts, dtype=np.float64), masks, method_index)
+
+    @classmethod
+    def from_table(cls, conn, fiat_currency):
+        """Build from a fiat table (raises sqlite3.OperationalError if it doesn't exist)."""
+        return cls(*read_fiat_masks(conn, fiat_currency))
+
+    def __len__(self):
+        return len(self.prices)
+
+    def total_liquidity(self):
+        return float(self.amounts.sum())
+
+    def vwap(self):
+        total_liquidity = self.total_liquidity()
+        return float(self.notional.sum()) / total_liquidity if total_liquidity > 0 else 0
+
+    def liquidity_for(self, methods):
+        """(liquidity, vwap) of the ads accepting any of the given methods."""
+        return liquidity_for_methods(self.prices, self.amounts, self.masks, self.method_index.query_mask(methods))
+
+    def liquidity_for_many(self, method_sets):
+        """[(liquidity, vwap)] for several method sets, answered in one pass over the ads."""
+        if not method_sets:
+            return []
+        query_masks = np.stack([self.method_index.query_mask(methods) for methods in method_sets])
+
+        # (ads x queries) selection matrix, then one matrix product per aggregate
+        selected = (self.masks[:, None, :] & query_masks[None, :, :]).any(axis=2).astype(np.float64)
+        liquidity = self.amounts @ selected
+        notional = self.notional @ selected
+        vwap = np.divide(notional, liquidity, out=np.zeros(len(method_sets)), where=liquidity > 0)
+        return [(float(l), float(v)) for l, v in zip(liquidity, vwap)]
+
+    def depth_ladder(self, methods=None):
+        """DepthLadder of every ad, or of the ads accepting any of the given methods."""
+        key = None if methods is None else frozenset(methods)
+        ladder = self._ladders.get(key)
+        if ladder is None:
+            if methods is None:
+                ladder = DepthLadder(self.prices, self.amounts)
+            else:
+                selected = (self.masks & self.method_index.query_mask(methods)).any(axis=1)
+                ladder = DepthLadder(self.prices[selected], self.amounts[selected])
+            # Snapshots are immutable, so a ladder stays valid until the snapshot is replaced
+            if len(self._ladders) >= LADDER_CACHE_SIZE:
+                self._ladders = {}
+            self._ladders[key] = ladder
+        return ladder
+
+    def method_ladders(self):
+        """[(method, DepthLadder)] of the ads accepting each method, largest liquidity first."""
+        method_ids = {method: i for i, method in enumerate(self.method_groups)}
+        ladders = []
+        for method, _, _ in self.per_method():
+            rows = self.method_rows[self.method_ids == method_ids[method]]
+            if len(rows):
+                ladders.append((method, DepthLadder(self.prices[rows], self.amounts[rows])))
+        return ladders
+
+    def per_method(self):
+        """[(method, liquidity, vwap)] for every method group, largest liquidity first."""
+        methods_count = len(self.method_groups)
+        liquidity = np.bincount(self.method_ids, weights=self.amounts[self.method_rows], minlength=methods_count)
+        notional = np.bincount(self.method_ids, weights=self.notional[self.method_rows], minlength=methods_count)
+        vwap = np.divide(notional, liquidity, out=np.zeros(methods_count), where=liquidity > 0)
+
+        # Stable sort keeps first-seen order between methods with equal liquidity
+        order = np.argsort(-liquidity, kind="stable")
+        return [(self.method_groups[i], float(liquidity[i]), float(vwap[i])) for i in order]
@@ -0,0 +1,74 @@
+import time
+
+# Rows handed to one executemany call
+INSERT_BATCH_SIZE = 5000
+
+
+def staging_table(fiat_currency):
+    return f"{fiat_currency}__staging"
+
+
+def create_ads_table(cursor, table):
+    """Per-fiat ads table (one row per advertisement)."""
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS "{table}" (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            advertiser_name TEXT,
+            price REAL,
+            available_amount REAL,
+            payment_methods TEXT,
+            timestamp TEXT,
+            method_mask BLOB
+        )
+    """)
+
+
+def create_staging_table(cursor, fiat_currency):
+    """Empty staging table for a fiat's next snapshot; leftovers from an interrupted run are dropped."""
+    table = staging_table(fiat_currency)
+    cursor.execute(f'DROP TABLE IF EXISTS "{table}"')
+    create_ads_table(cursor, table)
+    return table
+
+
+def swap_in_staging(cursor, fiat_currency):
+    """Replace a fiat's table with its staging table.
+
+    Opens a write transaction if none is active and leaves it open: the
+    caller adds the matching dashboard rows and commits, so readers see the
+    old snapshot or the new one, never an empty or partial table.
+    """
+    if not cursor.connection.in_transaction:
+        cursor.execute("BEGIN IMMEDIATE")
+    cursor.execute(f'DROP TABLE IF EXISTS "{fiat_currency}"')
+    cursor.execute(f'ALTER TABLE "{staging_table(fiat_currency)}" RENAME TO "{fiat_currency}"')
+
+
+def bulk_insert_ads(cursor, table, records, batch_size=INSERT_BATCH_SIZE):
+    """Insert (advertiser, price, amount, payment methods, timestamp, method mask) records with executemany.
+
+    The statement is prepared once and reused for every batch. The caller
+    commits, so the whole load is a single transaction. Returns
+    (rows, seconds) for rows/sec reporting.
+    """
+    sql = f"""
+        INSERT INTO "{table}" (advertiser_name, price, available_amount, payment_methods, timestamp, method_mask)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """
+    started = time.perf_counter()
+    rows = 0
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            cursor.executemany(sql, batch)
+            rows += len(batch)
+            batch = []
+    if batch:
+        cursor.executemany(sql, batch)
+        rows += len(batch)
+    return rows, time.perf_counter() - started
+
+
+def rows_per_second(rows, seconds):
+    return rows / seconds if seconds > 0 else float(rows)
@@ -1,120 +1,273 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import sqlite3
-import json
 from flask_cors import CORS
 from datetime import datetime
 import re
+import math
+import logging
+import base64
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from db_pool import ExchangePools
+from reference_data import ReferenceData
+from response_cache import ResponseCache, precompressed
+from json_stream import BATCH_SIZE, stream_query, stream_json_array
+from fast_json import FastJSONProvider
+from compression import compress_response
+from snapshot_cache import SnapshotCache
+from event_broker import EventBroker
+from common.dashboard_store import DASHBOARD_QUERY, format_dashboard_row, read_payment_method_stats, count_payment_methods, read_dashboard_document, spread_value, spread_expression
+from common.exchange_summary import read_exchange_summary
+from common.dashboard_history import HISTORY_COLUMNS, read_dashboard_history
+from common.liquidity_logs import ROLLUP_STATS, parse_timestamp, read_liquidity_logs, read_liquidity_series
+from common.price_distribution import QUANTILE_COLUMNS, price_distributions, read_price_distributions
 
 app = Flask(__name__)
-CORS(app)
+app.json = FastJSONProvider(app)
+# Negotiated gzip/brotli for everything the response cache doesn't already serve compressed
+app.after_request(compress_response)
+CORS(app, expose_headers=["ETag", "X-Next-Cursor"])
+logger = logging.getLogger(__name__)
+
+EXCHANGES = ("binance", "bybit", "okx")
+
+# Country-to-fiat mapping file for an exchange
+def get_mapping_path(exchange_name):
+    return f"C:\\Users\\kapse\\Desktop\\Pythonproject\\Archive\\{exchange_name}\\fiat2country.json"
+
+# Country/fiat mappings loaded once per process, reloaded when a file changes on disk
+reference_data = ReferenceData(get_mapping_path, EXCHANGES)
+for failed_exchange, error in reference_data.load_all().items():
+    logger.warning(f"Could not load fiat2country mapping for {failed_exchange}: {error}")
+
+# Database path for an exchange (can be modified for different exchanges)
+def get_db_path(exchange_name):
+    return f"C:\\Users\\kapse\\Desktop\\Pythonproject\\Archive\\database\\{exchange_name}_data.db"  # Modify this as per exchange
+
+# Default and maximum number of rows per /logs page
+LOGS_PAGE_SIZE = 500
+LOGS_MAX_PAGE_SIZE = 5000
+
+# /logs ?resolution= units, e.g. "30m", "6h", "1d", "1w"
+RESOLUTION_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+# Default and maximum number of points per /api/history response
+HISTORY_POINTS = 2000
+HISTORY_MAX_POINTS = 20000
+
+# Upper bound on queries answered by one /get_liquidity/batch request
+LIQUIDITY_BATCH_MAX_QUERIES = 500
+
+# Upper bounds on /api/depth ?amount= / ?price= values and ?levels=
+DEPTH_MAX_QUERIES = 100
+DEPTH_MAX_LEVELS = 1000
+
+# /api/dashboard ?sort= values
+DASHBOARD_SORTS = {"spread": "ASC", "-spread": "DESC"}
+
+# Normalize a from/to query arg to the "YYYY-MM-DD HH:MM:SS" format stored in the database
+def parse_time_arg(value, upper_bound=False):
+    value = value.strip().replace("T", " ")
+    parsed = datetime.fromisoformat(value)
+    if upper_bound and len(value) == 10:
+        # A bare date as upper bound includes that whole day
+        parsed = parsed.replace(hour=23, minute=59, second=59)
+    elif upper_bound and len(value) == 16:
+        parsed = parsed.replace(second=59)
+    return parsed.strftime("%Y-%m-%d %H:%M:%S")
 
-# Load country-to-fiat mapping
-def load_country_fiat_mapping(exchange_name):
-    with open(f"C:\\Users\\kapse\\Desktop\\Pythonproject\\Archive\\{exchange_name}\\fiat2country.json", "r") as f:
-        return json.load(f)
+# Bucket size in seconds for a /logs resolution ("1h" when the count is left out)
+def parse_resolution(value):
+    value = value.strip().lower()
+    count = int(value[:-1] or 1)
+    unit = value[-1:]
+    if unit not in RESOLUTION_UNITS or count < 1:
+        raise ValueError(value)
+    return count * RESOLUTION_UNITS[unit]
 
-# Database connection function (can be modified for different exchanges)
-def get_db_connection(exchange_name):
-    db_path = f"C:\\Users\\kapse\\Desktop\\Pythonproject\\Archive\\database\\{exchange_name}_data.db"  # Modify this as per exchange
-    return sqlite3.connect(db_path)
+# Opaque pagination cursors wrapping the last timestamp of a page
+def encode_cursor(timestamp):
+    return base64.urlsafe_b64encode(timestamp.encode()).decode()
+
+def decode_cursor(cursor):
+    timestamp = base64.b64decode(cursor.encode(), altchars=b"-_", validate=True).decode()
+    if not timestamp:
+        raise ValueError("Empty cursor")
+    return timestamp
+
+# Pooled, pre-warmed read-only connections, one pool per exchange database
+db_pools = ExchangePools(get_db_path, EXCHANGES)
+for failed_exchange, error in db_pools.warm().items():
+    logger.warning(f"Could not warm connection pool for {failed_exchange}: {error}")
+
+# Per-fiat columnar snapshots for liquidity math
+fiat_snapshots = SnapshotCache(db_pools)
+
+# Serialized GET responses, dropped as soon as the exchange's database changes
+response_cache = ResponseCache(db_pools.generation)
+
+# Scrape events pushed to /api/events subscribers
+scrape_events = EventBroker(db_pools, EXCHANGES)
+
+# One worker per exchange so /api/compare reads all databases at once
+compare_executor = ThreadPoolExecutor(max_workers=len(EXCHANGES), thread_name_prefix="compare")
 
 # Helper function to calculate liquidity
 def calculate_liquidity(fiat_table, payment_methods, exchange_name):
-    conn = get_db_connection(exchange_name)
-    cursor = conn.cursor()
-    
-    # Query to fetch relevant data from the exchange's database
-    query = f"""
-    SELECT price, available_amount, payment_methods
-    FROM {fiat_table}
-    """
+    # Columnar snapshot of the fiat table, rebuilt only after a scraper commits
     try:
-        cursor.execute(query)
-        rows = cursor.fetchall()
+        snapshot = fiat_snapshots.get(exchange_name, fiat_table)
     except sqlite3.OperationalError as e:
-        conn.close()
         raise ValueError(f"Table '{fiat_table}' does not exist in the database.")
-    finally:
-        conn.close()
-    
-    total_liquidity = 0
-    weighted_price_sum = 0
-    for row in rows:
-        price, available_amount, methods = row
-        methods_set = set(method.strip() for method in methods.split(","))
-        
-        processed = False
-        
-        # Check if 'Bank Transfer' is in payment methods
-        if "Bank Transfer" in payment_methods:
-            if any("bank" in method.lower() for method in methods_set):
-                if not processed:
-                    total_liquidity += available_amount
-                    weighted_price_sum += price * available_amount
-                    processed = True
-        
-        # Handle other payment methods independently
-        if not processed and methods_set.intersection(payment_methods):
-            total_liquidity += available_amount
-            weighted_price_sum += price * available_amount
-            processed = True
 
-    vwap = weighted_price_sum / total_liquidity if total_liquidity > 0 else 0
+    # Ads accepting any requested method ("Bank Transfer" covers every bank method)
+    total_liquidity, vwap = snapshot.liquidity_for(payment_methods)
 
     return {"specific_liquidity": f"{total_liquidity:.2f}", "specific_vwap": f"{vwap:.2f}"}
 
+# Comma-separated positive numbers of a query arg, e.g. ?amount=100,500,1000
+def parse_number_list(name):
+    values = [float(value) for value in request.args.get(name, '').split(',') if value.strip()]
+    if len(values) > DEPTH_MAX_QUERIES or any(not value > 0 or value == float('inf') for value in values):
+        raise ValueError(name)
+    return values
+
+# Fiat table named by ?fiat= or ?country=; raises ValueError for ones the exchange doesn't map
+def fiat_from_args(exchange_name):
+    fiat_table = request.args.get('fiat', '').upper()
+    if fiat_table:
+        # Only mapped fiats reach the snapshot query, which interpolates the table name
+        if fiat_table not in reference_data.fiat_to_country(exchange_name):
+            raise ValueError(f"Fiat '{fiat_table}' is not recognized")
+        return fiat_table
+    country = request.args.get('country')
+    fiat_table = reference_data.fiat_for_country(exchange_name, country)
+    if not fiat_table:
+        raise ValueError(f"Country '{country}' is not recognized")
+    return fiat_table
+
+# Row formatter for streamed dashboard rows, using the normalized per-method stats when the database has them
+def dashboard_row_formatter(method_stats):
+    return lambda row: format_dashboard_row(row, method_stats)
+
+# Optional min_spread / max_spread / sort args of /api/dashboard; raises ValueError on bad input
+def parse_spread_filter():
+    min_spread = float(request.args['min_spread']) if request.args.get('min_spread') else None
+    max_spread = float(request.args['max_spread']) if request.args.get('max_spread') else None
+    sort = request.args.get('sort') or None
+    if sort is not None and sort not in DASHBOARD_SORTS:
+        raise ValueError(sort)
+    # float() accepts "nan" and "inf", which would silently match nothing
+    if any(value is not None and not math.isfinite(value) for value in (min_spread, max_spread)):
+        raise ValueError("spread bounds must be finite")
+    return min_spread, max_spread, sort
+
+# Dashboard query for one fiat and/or a spread filter, filtered and sorted in SQL on the spread index
+def dashboard_query(conn, fiat_currency=None, spread_filter=(None, None, None)):
+    min_spread, max_spread, sort = spread_filter
+    spread = spread_expression(conn)
+    conditions = []
+    params = []
+    if fiat_currency is not None:
+        conditions.append("fiat_currency = ?")
+        params.append(fiat_currency)
+    if min_spread is not None:
+        conditions.append(f"{spread} >= ?")
+        params.append(min_spread)
+    if max_spread is not None:
+        conditions.append(f"{spread} <= ?")
+        params.append(max_spread)
+
+    query = DASHBOARD_QUERY
+    if conditions:
+        query += f" WHERE {' AND '.join(conditions)}"
+    if sort is not None:
+        query += f" ORDER BY {spread} {DASHBOARD_SORTS[sort]}, fiat_currency"
+    return query, params
+
 # Function to fetch and format data for the dashboard
-def fetch_and_format_data(exchange_name):
-    conn = get_db_connection(exchange_name)
-    cursor = conn.cursor()
+def fetch_and_format_data(conn, fiat_currency=None, spread_filter=(None, None, None)):
+    query, params = dashboard_query(conn, fiat_currency, spread_filter)
+    rows = conn.execute(query, params).fetchall()
+    method_stats = read_payment_method_stats(conn, fiat_currency)
     
-    cursor.execute("SELECT date_time, country, fiat_currency, total_liquidity, volume_weighted_price, exchange_rate, spread, available_payment_methods FROM dashboard")
-    rows = cursor.fetchall()
-    conn.close()
-    
-    formatted_data = []
-    for row in rows:
-        raw_payment_methods = row[7]
-        payment_methods_list = []
-        date_time = row[0]
-        formatted_date_time = datetime.strptime(date_time, "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%d %H:%M")
-        
-        for method in raw_payment_methods.split(','):
-            method = method.strip()
-            if '(' in method and ')' in method:
-                parts = method.split('(')
-                method_name = parts[0].strip()
-                liquidity = parts[1].split(')')[0].strip()
-                vwap = parts[2].split(')')[0].strip() if len(parts) > 2 else None
-                payment_methods_list.append({"method": method_name, "liquidity": liquidity, "vwap": vwap})
-        
-        formatted_data.append({
-            "date_time": formatted_date_time,
-            "country": row[1],
-            "fiat_currency": row[2],
-            "total_liquidity": row[3],
-            "volume_weighted_price": row[4],
-            "exchange_rate": row[5],
-            "spread": row[6],
-            "available_payment_methods": payment_methods_list
-        })
-    
-    return formatted_data
+    return [format_dashboard_row(row, method_stats) for row in rows]
+
+# Row formatter for the logs table, timestamps trimmed to "YYYY-MM-DD HH:MM"
+# "YYYY-MM-DD HH:MM" form of a logged timestamp; older rows lack zero padding, so it is parsed rather than sliced
+def format_log_timestamp(timestamp):
+    return parse_timestamp(timestamp).strftime("%Y-%m-%d %H:%M")
+
+def log_row_formatter(conn, columns):
+    timestamp_idx = columns.index('timestamp')
+
+    def format_log_row(row):
+        log_entry = dict(zip(columns, row))
+        log_entry['timestamp'] = format_log_timestamp(row[timestamp_idx])
+        return log_entry
+
+    return format_log_row
+
+# /logs rows ({"timestamp", country: liquidity, ...}) from read_liquidity_logs() output; columns maps fiat -> country
+def pivot_liquidity_logs(runs, columns):
+    return [
+        {"timestamp": format_log_timestamp(timestamp), **{country: values.get(fiat, 0) for fiat, country in columns.items()}}
+        for timestamp, values in runs
+    ]
+
+# Column list for the old wide logs table, limited to the requested countries it has
+def wide_logs_select(conn, countries):
+    if countries is None:
+        return "*"
+    existing = {column[0] for column in conn.execute("SELECT * FROM logs LIMIT 0").description}
+    quoted = ['"' + country.replace('"', '""') + '"' for country in countries if country in existing]
+    return ", ".join(["timestamp"] + quoted)
+
+# Streaming variant of /logs: rows are read and encoded in batches while the body is sent
+def stream_logs(exchange_name, where, params, limit, select="*"):
+    pool = db_pools.get(exchange_name)
+
+    # Headers go out before the rows, so find the next cursor (and empty pages) up front
+    with pool.connection() as conn:
+        page_end = conn.execute(f"SELECT timestamp FROM logs {where} ORDER BY timestamp DESC LIMIT 2 OFFSET ?", params + [limit - 1]).fetchall()
+        if not page_end and conn.execute(f"SELECT 1 FROM logs {where} LIMIT 1", params).fetchone() is None:
+            return jsonify({"message": "No data found"}), 404
+
+    query = f"SELECT {select} FROM logs {where} ORDER BY timestamp DESC LIMIT ?"
+    response = Response(stream_query(pool, query, params + [limit], log_row_formatter), mimetype="application/json")
+    if len(page_end) > 1:
+        response.headers['X-Next-Cursor'] = encode_cursor(page_end[0][0])
+    return response
+
+# Streaming responses are opt-in with ?stream=1
+def wants_stream():
+    return request.args.get('stream', '').lower() in ('1', 'true', 'yes')
 
 # Fetch data for calculation metrics
 def fetch_data_from_db(exchange_name):
-    conn = get_db_connection(exchange_name)
-    cursor = conn.cursor()
-    cursor.execute("SELECT country, total_liquidity, spread, available_payment_methods FROM dashboard")
-    data = cursor.fetchall()
-    conn.close()
-    return data
+    with db_pools.connection(exchange_name) as conn:
+        data = conn.execute("SELECT country, total_liquidity, spread, available_payment_methods FROM dashboard").fetchall()
+        payment_methods_count = count_payment_methods(conn)
+    return data, payment_methods_count
 
 # API to calculate dashboard metrics (reusable for all exchanges)
 @app.route('/calculate', methods=['GET'])
+@response_cache.cached(default_exchange='okx')
 def calculate_dashboard_metrics():
     exchange_name = request.args.get('exchange', 'okx')  # Default to okx if not provided
-    data = fetch_data_from_db(exchange_name)
+    if exchange_name not in EXCHANGES:
+        return jsonify({"error": f"Unknown exchange '{exchange_name}'"}), 400
+    # Single-row read of the totals the scrapers maintain as they publish each fiat
+    with db_pools.connection(exchange_name) as conn:
+        summary = read_exchange_summary(conn)
+    if summary is not None:
+        return jsonify(summary)
+
+    # Databases no scraper has written the summary to yet: aggregate the dashboard table
+    data, payment_methods_count = fetch_data_from_db(exchange_name)
     
     total_liquidity = 0
     total_spread = 0
@@ -125,24 +278,27 @@ def calculate_dashboard_metrics():
     for row in data:
         country, liquidity, spread, payment_methods = row
         total_liquidity += liquidity
-        spread_value = float(re.sub(r'[^\d.]', '', spread))  # Remove % and other characters
-        total_spread += spread_value
+        total_spread += spread_value(spread)
         total_countries.add(country)
         
-        methods = re.findall(r'\b[\w\s]+(?:\(\d+\.\d+\))?', payment_methods)
-        for method in methods:
-            method_name = method.split('(')[0].strip()
-            if method_name not in seen_payment_methods:
-                seen_payment_methods.add(method_name)
-                unique_payment_methods.add(method_name)
+        # Older databases only have the packed payment methods string
+        if payment_methods_count is None:
+            methods = re.findall(r'\b[\w\s]+(?:\(\d+\.\d+\))?', payment_methods)
+            for method in methods:
+                method_name = method.split('(')[0].strip()
+                if method_name not in seen_payment_methods:
+                    seen_payment_methods.add(method_name)
+                    unique_payment_methods.add(method_name)
     
     avg_spread = total_spread / len(data) if data else 0
+    if payment_methods_count is None:
+        payment_methods_count = len(unique_payment_methods)
 
     result = {
         'total_liquidity': total_liquidity,
         'average_spread': avg_spread,
         'total_countries': len(total_countries),
-        'unique_payment_methods_count': len(unique_payment_methods)
+        'unique_payment_methods_count': payment_methods_count
     }
 
     return jsonify(result)
@@ -159,14 +315,8 @@ def get_liquidity():
             return jsonify({"error": "Country and payment methods are required"}), 400
         
         # Find fiat table name from country name
-        fiat_table = None
         exchange_name = request.args.get('exchange', 'okx')  # Default to OKX if not provided
-        
-        COUNTRY_TO_FIAT = load_country_fiat_mapping(exchange_name)
-        for fiat, mapped_country in COUNTRY_TO_FIAT.items():
-            if mapped_country.lower() == country.lower():
-                fiat_table = fiat
-                break
+        fiat_table = reference_data.fiat_for_country(exchange_name, country)
         
         if not fiat_table:
             return jsonify({"error": f"Country '{country}' is not recognized"}), 404
@@ -180,64 +330,393 @@ def get_liquidity():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Batch variant of /get_liquidity: answers many {country, payment_methods[, exchange]} queries in one round trip.
+# Queries are grouped by fiat table so each snapshot is fetched and scanned once.
+@app.route('/get_liquidity/batch', methods=['POST'])
+def get_liquidity_batch():
+    data = request.get_json(silent=True)
+    queries = data.get('queries') if isinstance(data, dict) else data
+    if not isinstance(queries, list) or not queries:
+        return jsonify({"error": "A non-empty list of queries is required"}), 400
+    if len(queries) > LIQUIDITY_BATCH_MAX_QUERIES:
+        return jsonify({"error": f"At most {LIQUIDITY_BATCH_MAX_QUERIES} queries per batch"}), 400
+
+    default_exchange = request.args.get('exchange', 'okx')
+    results = [None] * len(queries)
+    groups = {}  # (exchange, fiat table) -> [(position, payment methods)]
+
+    for position, query in enumerate(queries):
+        if not isinstance(query, dict):
+            results[position] = {"error": "Each query must be an object", "status": 400}
+            continue
+        exchange_name = query.get('exchange', default_exchange)
+        country = query.get('country')
+        payment_methods = query.get('payment_methods', [])
+        results[position] = {"exchange": exchange_name, "country": country, "payment_methods": payment_methods}
+
+        if not (isinstance(exchange_name, str) and isinstance(country or "", str) and isinstance(payment_methods, list)
+                and all(isinstance(method, str) for method in payment_methods)):
+            results[position].update(error="exchange and country must be strings, payment_methods a list of strings", status=400)
+            continue
+        if not country or not payment_methods:
+            results[position].update(error="Country and payment methods are required", status=400)
+            continue
+        try:
+            fiat_table = reference_data.fiat_for_country(exchange_name, country)
+        except ValueError as ve:
+            results[position].update(error=str(ve), status=404)
+            continue
+        if not fiat_table:
+            results[position].update(error=f"Country '{country}' is not recognized", status=404)
+            continue
+
+        results[position]["fiat_currency"] = fiat_table
+        groups.setdefault((exchange_name, fiat_table), []).append((position, set(payment_methods)))
+
+    for (exchange_name, fiat_table), members in groups.items():
+        try:
+            snapshot = fiat_snapshots.get(exchange_name, fiat_table)
+        except sqlite3.OperationalError:
+            for position, _ in members:
+                results[position].update(error=f"Table '{fiat_table}' does not exist in the database.", status=404)
+            continue
+
+        answers = snapshot.liquidity_for_many([payment_methods for _, payment_methods in members])
+        for (position, _), (total_liquidity, vwap) in zip(members, answers):
+            results[position].update(specific_liquidity=f"{total_liquidity:.2f}", specific_vwap=f"{vwap:.2f}")
+
+    return jsonify({"results": results})
+
+# Order-book depth of one fiat: what buying each ?amount= costs walking up from the cheapest ad,
+# and how much is on offer at or below each ?price=. ?methods= (comma-separated) limits the book
+# to ads accepting any of them; ?levels=N adds the N cheapest price levels.
+@app.route('/api/depth', methods=['GET'])
+@response_cache.cached(default_exchange='okx')
+def get_depth():
+    exchange_name = request.args.get('exchange', 'okx')
+    methods = [method.strip() for method in request.args.get('methods', '').split(',') if method.strip()]
+    try:
+        amounts = parse_number_list('amount')
+        prices = parse_number_list('price')
+        levels = int(request.args.get('levels', 0))
+        if not 0 <= levels <= DEPTH_MAX_LEVELS:
+            raise ValueError(levels)
+    except ValueError:
+        return jsonify({"error": f"amount and price take up to {DEPTH_MAX_QUERIES} positive numbers, levels 0-{DEPTH_MAX_LEVELS}"}), 400
+    if not request.args.get('country') and not request.args.get('fiat'):
+        return jsonify({"error": "country or fiat is required"}), 400
+
+    try:
+        fiat_table = fiat_from_args(exchange_name)
+        snapshot = fiat_snapshots.get(exchange_name, fiat_table)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 404
+    except sqlite3.OperationalError:
+        return jsonify({"error": f"Table '{fiat_table}' does not exist in the database."}), 404
+
+    # Price-sorted running totals, built once per snapshot and method set; each query is a binary search
+    ladder = snapshot.depth_ladder(set(methods) if methods else None)
+    best_price = ladder.best_price()
+    result = {
+        "exchange": exchange_name,
+        "fiat_currency": fiat_table,
+        "payment_methods": methods,
+        "ads": len(ladder),
+        "total_liquidity": ladder.total(),
+        "best_price": best_price
+    }
+
+    if amounts:
+        filled, average, worst = ladder.fill(amounts)
+        result["fills"] = [{
+            "amount": amount,
+            "filled": float(f),
+            "average_price": float(a),
+            "worst_price": float(w),
+            # Average price paid above the best ad's price
+            "slippage_percent": float((a / best_price - 1) * 100) if f > 0 else 0.0
+        } for amount, f, a, w in zip(amounts, filled, average, worst)]
+    if prices:
+        available, average = ladder.depth_at(prices)
+        result["depth"] = [
+            {"price": price, "amount": float(amount), "average_price": float(a)}
+            for price, amount, a in zip(prices, available, average)
+        ]
+    if levels:
+        level_prices, level_amounts, cumulative = ladder.levels(levels)
+        result["levels"] = [
+            {"price": float(price), "amount": float(amount), "cumulative_amount": float(total)}
+            for price, amount, total in zip(level_prices, level_amounts, cumulative)
+        ]
+    return jsonify(result)
+
+# Liquidity-weighted price quantiles and a price histogram of one fiat's ads, overall ("payment_method": null)
+# and per method; ?methods= (comma-separated) limits which methods are listed. All histograms share the same bins.
+@app.route('/api/distribution', methods=['GET'])
+@response_cache.cached(default_exchange='okx')
+def get_distribution():
+    exchange_name = request.args.get('exchange', 'okx')
+    methods = {method.strip() for method in request.args.get('methods', '').split(',') if method.strip()}
+    if not request.args.get('country') and not request.args.get('fiat'):
+        return jsonify({"error": "country or fiat is required"}), 400
+
+    try:
+        fiat_table = fiat_from_args(exchange_name)
+        # Written by the scraper with each fiat's ads
+        with db_pools.connection(exchange_name) as conn:
+            distributions = read_price_distributions(conn, fiat_table)
+        if not distributions:
+            # Fiats not scraped since the table was added are described from their snapshot
+            distributions = price_distributions(fiat_snapshots.get(exchange_name, fiat_table))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 404
+    except sqlite3.OperationalError:
+        return jsonify({"error": f"Table '{fiat_table}' does not exist in the database."}), 404
+    if not distributions:
+        return jsonify({"message": "No data found"}), 404
+
+    return jsonify({
+        "exchange": exchange_name,
+        "fiat_currency": fiat_table,
+        "quantiles": list(QUANTILE_COLUMNS),
+        "distributions": [
+            dict(distribution, payment_method=method)
+            for method, distribution in distributions
+            if method is None or not methods or method in methods
+        ]
+    })
+
 # API route for the dashboard data
 @app.route('/api/dashboard', methods=['GET'])
+@response_cache.cached(default_exchange='okx')
 def get_dashboard():
+    try:
+        spread_filter = parse_spread_filter()
+    except ValueError:
+        return jsonify({"error": f"Invalid min_spread, max_spread or sort ({', '.join(DASHBOARD_SORTS)})"}), 400
+
     try:
         exchange_name = request.args.get('exchange', 'okx')
-        data = fetch_and_format_data(exchange_name)
+        # Optional single-fiat view, for clients refreshing one row after a scrape event
+        fiat_currency = request.args.get('fiat', '').upper() or None
+        if wants_stream():
+            pool = db_pools.get(exchange_name)
+            with pool.connection() as conn:
+                query, params = dashboard_query(conn, fiat_currency, spread_filter)
+            row_formatter = lambda conn, columns: dashboard_row_formatter(read_payment_method_stats(conn, fiat_currency))
+            return Response(stream_query(pool, query, params, row_formatter), mimetype="application/json")
+        with db_pools.connection(exchange_name) as conn:
+            # Ready-to-serve document the scraper wrote with its last commit; formatting the rows is the fallback
+            unfiltered = fiat_currency is None and spread_filter == (None, None, None)
+            document = read_dashboard_document(conn) if unfiltered else None
+            if document is None:
+                data = fetch_and_format_data(conn, fiat_currency, spread_filter)
+        if document is not None:
+            body, body_gzip = document
+            return precompressed(Response(body, mimetype="application/json"), gzip=body_gzip)
         return jsonify(data)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
 @app.route('/logs', methods=['GET'])
+@response_cache.cached()
 def get_logs():
     exchange_name = request.args.get('exchange')
 
     if not exchange_name:
         return jsonify({"error": "Exchange name is required"}), 400
 
-    # Connect to SQLite database
-    conn = get_db_connection(exchange_name)
-    cursor = conn.cursor()
+    # Optional time window and keyset cursor, all served by the timestamp index
+    try:
+        limit = int(request.args.get('limit', LOGS_PAGE_SIZE))
+        if not 1 <= limit <= LOGS_MAX_PAGE_SIZE:
+            raise ValueError(limit)
+        start = parse_time_arg(request.args['from']) if request.args.get('from') else None
+        end = parse_time_arg(request.args['to'], upper_bound=True) if request.args.get('to') else None
+        before = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        # Bucketed rows ("6h", "1d", ...) come from the hourly/daily rollups instead of every run
+        resolution = request.args.get('resolution', 'raw')
+        bucket_seconds = None if resolution == 'raw' else parse_resolution(resolution)
+        stat = request.args.get('stat', 'avg')
+        if stat not in ROLLUP_STATS:
+            raise ValueError(stat)
+    except ValueError:
+        return jsonify({"error": f"Invalid from, to, cursor, limit (1-{LOGS_MAX_PAGE_SIZE}), resolution or stat ({', '.join(ROLLUP_STATS)})"}), 400
+
+    conditions = []
+    params = []
+    for condition, value in (("timestamp >= ?", start), ("timestamp <= ?", end), ("timestamp < ?", before)):
+        if value is not None:
+            conditions.append(condition)
+            params.append(value)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    # Optional subset of countries, e.g. ?countries=India,Brazil
+    requested = [country.strip() for country in request.args.get('countries', '').split(',') if country.strip()]
 
     try:
-        # Fetch column names dynamically
-        cursor.execute("PRAGMA table_info(logs)")
-        columns = [column[1] for column in cursor.fetchall()]
+        # Output columns as {fiat: country}, in mapping order unless countries were requested
+        fiat_to_country = reference_data.fiat_to_country(exchange_name)
+        if requested:
+            columns = {}
+            for country in requested:
+                fiat_currency = reference_data.fiat_for_country(exchange_name, country)
+                if fiat_currency is None:
+                    return jsonify({"error": f"Country '{country}' is not recognized"}), 400
+                columns[fiat_currency] = fiat_to_country[fiat_currency]
+        else:
+            columns = dict(fiat_to_country)
+        countries = list(columns.values()) if requested else None
 
-        # Validate required columns
-        if 'timestamp' not in columns:
-            return jsonify({"error": "'timestamp' column is missing in the logs table"}), 500
+        fiats = list(columns) if requested else None
+        with db_pools.connection(exchange_name) as conn:
+            # Long-format logs: one page of runs (or buckets), reading only the requested fiats
+            if bucket_seconds is None:
+                runs = read_liquidity_logs(conn, conditions, params, limit + 1, fiats)
+            else:
+                runs = read_liquidity_series(conn, bucket_seconds, limit + 1, start, end, before, fiats, stat)
+            if runs is None and bucket_seconds is None:
+                # Databases that only have the old one-column-per-country table
+                select = wide_logs_select(conn, countries)
+                if not wants_stream():
+                    # Newest first; one extra row tells us whether there is a next page
+                    cursor = conn.execute(f"SELECT {select} FROM logs {where} ORDER BY timestamp DESC LIMIT ?", params + [limit + 1])
+                    columns = [column[0] for column in cursor.description]
+                    rows = cursor.fetchall()
 
-        # Query all logs data in descending order
-        query = "SELECT * FROM logs ORDER BY timestamp DESC"
-        cursor.execute(query)
-        rows = cursor.fetchall()
+        if runs is None and bucket_seconds is not None:
+            return jsonify({"error": "resolution needs the long-format logs; run migrate.py on this database"}), 400
+        if runs is not None:
+            if not runs:
+                return jsonify({"message": "No data found"}), 404
+            has_more = len(runs) > limit
+            runs = runs[:limit]
+            if wants_stream():
+                # The page is already in memory; pivot and encode it a batch of runs at a time
+                batches = (pivot_liquidity_logs(runs[i:i + BATCH_SIZE], columns) for i in range(0, len(runs), BATCH_SIZE))
+                response = Response(stream_json_array(batches, lambda row: row), mimetype="application/json")
+            else:
+                response = jsonify(pivot_liquidity_logs(runs, columns))
+            if has_more:
+                response.headers['X-Next-Cursor'] = encode_cursor(runs[-1][0])
+            return response, 200
+
+        if wants_stream():
+            return stream_logs(exchange_name, where, params, limit, select)
 
         if not rows:
             return jsonify({"message": "No data found"}), 404
 
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
         # Format the response
-        response_data = []
-        for row in rows:
-            log_entry = {}
-            for idx, column in enumerate(columns):
-                if column == 'timestamp':
-                    # Format timestamp to "YYYY-MM-DD HH:MM"
-                    log_entry[column] = datetime.strptime(row[idx], "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%d %H:%M")
-                else:
-                    log_entry[column] = row[idx]
-            response_data.append(log_entry)
-
-        return jsonify(response_data), 200  
+        format_log_row = log_row_formatter(conn, columns)
+        response = jsonify([format_log_row(row) for row in rows])
+        if has_more:
+            response.headers['X-Next-Cursor'] = encode_cursor(rows[-1][columns.index('timestamp')])
+        return response, 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-    finally:
-        conn.close()
+# Time series of one fiat's dashboard rows, one point per scrape run
+@app.route('/api/history', methods=['GET'])
+@response_cache.cached(default_exchange='okx')
+def get_history():
+    exchange_name = request.args.get('exchange', 'okx')
+    fiat_currency = request.args.get('fiat', '').upper()
+    if exchange_name not in EXCHANGES:
+        return jsonify({"error": f"Unknown exchange '{exchange_name}'"}), 400
+    if not fiat_currency:
+        return jsonify({"error": "fiat is required"}), 400
+
+    # Window read as one range of the (fiat, time) key; the latest points win when it exceeds the limit
+    try:
+        limit = int(request.args.get('limit', HISTORY_POINTS))
+        if not 1 <= limit <= HISTORY_MAX_POINTS:
+            raise ValueError(limit)
+        start = parse_time_arg(request.args['from']) if request.args.get('from') else None
+        end = parse_time_arg(request.args['to'], upper_bound=True) if request.args.get('to') else None
+    except ValueError:
+        return jsonify({"error": f"Invalid from, to or limit (1-{HISTORY_MAX_POINTS})"}), 400
+
+    try:
+        with db_pools.connection(exchange_name) as conn:
+            rows = read_dashboard_history(conn, fiat_currency, start, end, limit)
+        if not rows:
+            return jsonify({"message": "No data found"}), 404
+        # Timestamps trimmed to "YYYY-MM-DD HH:MM" like /logs
+        return jsonify([dict(zip(HISTORY_COLUMNS, row), date_time=row[0][:16]) for row in rows])
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Dashboard columns compared side by side across exchanges
+def fetch_compare_rows(exchange_name):
+    with db_pools.connection(exchange_name) as conn:
+        return conn.execute("SELECT fiat_currency, country, total_liquidity, volume_weighted_price, spread FROM dashboard").fetchall()
+
+# Liquidity, VWAP and spread of every exchange joined by fiat, the databases read in parallel
+@app.route('/api/compare', methods=['GET'])
+@response_cache.cached(exchanges=EXCHANGES)
+def get_compare():
+    futures = {exchange_name: compare_executor.submit(fetch_compare_rows, exchange_name) for exchange_name in EXCHANGES}
+
+    by_fiat = {}
+    errors = {}
+    for exchange_name, future in futures.items():
+        try:
+            rows = future.result()
+        except Exception as e:
+            # One unreadable database shouldn't hide the other exchanges
+            errors[exchange_name] = str(e)
+            continue
+        for fiat_currency, country, total_liquidity, vwap, spread in rows:
+            entry = by_fiat.setdefault(fiat_currency, {
+                "fiat_currency": fiat_currency,
+                "country": country,
+                "exchanges": dict.fromkeys(EXCHANGES)
+            })
+            entry["exchanges"][exchange_name] = {
+                "total_liquidity": total_liquidity,
+                "volume_weighted_price": vwap,
+                "spread": spread_value(spread)
+            }
+
+    if len(errors) == len(EXCHANGES):
+        return jsonify({"error": "No exchange database could be read", "errors": errors}), 500
+
+    return jsonify({
+        "exchanges": list(EXCHANGES),
+        "data": [by_fiat[fiat_currency] for fiat_currency in sorted(by_fiat)],
+        "errors": errors
+    })
+
+# Server-Sent Events: a "scrape" event each time a scraper commits a fiat, a "run" event when a run finishes.
+# ?exchange= and ?fiat= take comma-separated filters; reconnecting clients resume via Last-Event-ID.
+@app.route('/api/events', methods=['GET'])
+def get_events():
+    exchanges = [name for name in request.args.get('exchange', '').split(',') if name]
+    fiats = [fiat for fiat in request.args.get('fiat', '').upper().split(',') if fiat]
+    unknown = [name for name in exchanges if name not in EXCHANGES]
+    if unknown:
+        return jsonify({"error": f"Unknown exchange '{unknown[0]}'"}), 400
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    response = Response(scrape_events.subscribe(last_event_id, exchanges, fiats), mimetype="text/event-stream")
+    response.headers['Cache-Control'] = 'no-cache'
+    # Ask reverse proxies not to buffer the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
+# Connection pool and cache usage
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    return jsonify({
+        "pools": db_pools.stats(),
+        "snapshots": fiat_snapshots.stats(),
+        "response_cache": response_cache.stats(),
+        "events": scrape_events.stats()
+    })
 
 
 if __name__ == '__main__':
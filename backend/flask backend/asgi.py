@@ -0,0 +1,223 @@
+"""ASGI entry point serving the same routes as app.py.
+
+    uvicorn asgi:application --workers 4        (single host, quick start)
+    gunicorn -c gunicorn.conf.py                (production profile)
+
+Flask views run on a bounded thread pool, so slow sqlite work never blocks
+the event loop, and a busy process queues requests instead of spawning
+threads. A streamed body takes its pooled connection with its first chunk,
+still on that pool; the rest is pulled on a separate stream pool, which
+never waits on a connection, so open streams can always finish and release
+theirs.
+/api/events is served natively on the event loop, so idle SSE clients
+don't hold a thread.
+"""
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from app import app as flask_app, db_pools, scrape_events, EXCHANGES
+from event_broker import KEEP_ALIVE
+
+# One thread per pooled connection: more would only queue inside the pools
+DB_EXECUTOR_WORKERS = len(EXCHANGES) * db_pools.size
+
+# Every open stream holds a pooled connection, so this many never queue behind each other
+STREAM_EXECUTOR_WORKERS = len(EXCHANGES) * db_pools.size
+
+# Largest request body accepted (the batch liquidity endpoint is the biggest caller)
+MAX_BODY_BYTES = 1024 * 1024
+
+_DONE = object()
+
+
+def build_environ(scope, body):
+    """WSGI environ for an ASGI HTTP scope."""
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+        "QUERY_STRING": scope["query_string"].decode("latin1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        # The body is fully buffered, so it can be read without a Content-Length (chunked uploads)
+        "wsgi.input_terminated": True,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+        environ["REMOTE_PORT"] = str(scope["client"][1])
+
+    for name, value in scope["headers"]:
+        name = name.decode("latin1")
+        if name == "content-type":
+            key = "CONTENT_TYPE"
+        elif name == "content-length":
+            key = "CONTENT_LENGTH"
+        else:
+            key = "HTTP_" + name.upper().replace("-", "_")
+        value = value.decode("latin1")
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def read_body(receive):
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        body.extend(message.get("body", b""))
+        if len(body) > MAX_BODY_BYTES:
+            raise ValueError("Request body too large")
+        if not message.get("more_body"):
+            return bytes(body)
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def send_simple(send, status, body, content_type=b"application/json"):
+    await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", content_type)]})
+    await send({"type": "http.response.body", "body": body})
+
+
+class AsgiApplication:
+    """ASGI app running the Flask WSGI app on a bounded executor, with native async SSE."""
+
+    def __init__(self, wsgi_app, max_workers=DB_EXECUTOR_WORKERS, stream_workers=STREAM_EXECUTOR_WORKERS):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="asgi-db")
+        # Threads blocked in pool.acquire on the request executor must not starve the streams holding connections
+        self.stream_executor = ThreadPoolExecutor(max_workers=stream_workers, thread_name_prefix="asgi-stream")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http":
+            if scope["path"] == "/api/events" and scope["method"] == "GET":
+                await self.stream_events(scope, receive, send)
+            else:
+                await self.call_wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.stream_executor.shutdown(wait=False, cancel_futures=True)
+                db_pools.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def call_wsgi(self, scope, receive, send):
+        try:
+            body = await read_body(receive)
+        except ValueError as e:
+            await send_simple(send, 413, f'{{"error": "{e}"}}'.encode())
+            return
+        if body is None:
+            return
+
+        loop = asyncio.get_running_loop()
+        response_start = {}
+
+        def start_response(status, headers, exc_info=None):
+            response_start["status"] = int(status.split(" ", 1)[0])
+            response_start["headers"] = [(name.lower().encode("latin1"), value.encode("latin1")) for name, value in headers]
+            return lambda data: None
+
+        def start(environ):
+            iterable = self.wsgi_app(environ, start_response)
+            iterator = iter(iterable)
+            # A streamed query acquires its connection on the first chunk, so any wait on the pool happens here
+            try:
+                return iterable, iterator, next(iterator, _DONE)
+            except BaseException:
+                close = getattr(iterable, "close", None)
+                if close is not None:
+                    close()
+                raise
+
+        environ = build_environ(scope, body)
+        iterable, iterator, chunk = await loop.run_in_executor(self.executor, start, environ)
+        disconnect = asyncio.ensure_future(wait_for_disconnect(receive))
+        try:
+            await send({"type": "http.response.start", "status": response_start["status"], "headers": response_start["headers"]})
+            while chunk is not _DONE and not disconnect.done():
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                chunk = await loop.run_in_executor(self.stream_executor, next, iterator, _DONE)
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            disconnect.cancel()
+            # Releases pooled connections held by an unfinished stream
+            close = getattr(iterable, "close", None)
+            if close is not None:
+                await loop.run_in_executor(self.stream_executor, close)
+
+    async def stream_events(self, scope, receive, send):
+        """/api/events on the event loop: waits for the broker's callback instead of blocking a thread."""
+        query = parse_qs(scope["query_string"].decode("latin1"))
+        exchanges = [name for value in query.get("exchange", []) for name in value.split(",") if name]
+        fiats = [fiat for value in query.get("fiat", []) for fiat in value.upper().split(",") if fiat]
+        unknown = [name for name in exchanges if name not in EXCHANGES]
+        if unknown:
+            await send_simple(send, 400, f'{{"error": "Unknown exchange \'{unknown[0]}\'"}}'.encode())
+            return
+
+        headers = dict(scope["headers"])
+        last_event_id = headers.get(b"last-event-id", b"").decode("latin1") or query.get("last_event_id", [None])[0]
+
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+        notify = lambda: loop.call_soon_threadsafe(wakeup.set)
+        # The first subscription loads the backlog from the databases
+        positions = await loop.run_in_executor(self.executor, scrape_events.open_subscription, last_event_id)
+        scrape_events.add_listener(notify)
+        disconnect = asyncio.ensure_future(wait_for_disconnect(receive))
+        try:
+            await send({"type": "http.response.start", "status": 200, "headers": [
+                (b"content-type", b"text/event-stream; charset=utf-8"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+                (b"access-control-allow-origin", b"*"),
+            ]})
+            await send({"type": "http.response.body", "body": f"retry: {scrape_events.retry_ms}\n\n".encode(), "more_body": True})
+            while not disconnect.done():
+                wakeup.clear()
+                messages = scrape_events.drain(positions, exchanges, fiats)
+                if not messages:
+                    woken = asyncio.ensure_future(wakeup.wait())
+                    await asyncio.wait({woken, disconnect}, timeout=scrape_events.heartbeat, return_when=asyncio.FIRST_COMPLETED)
+                    woken.cancel()
+                    if wakeup.is_set() or disconnect.done():
+                        continue
+                    messages = [KEEP_ALIVE]
+                await send({"type": "http.response.body", "body": "".join(messages).encode(), "more_body": True})
+        finally:
+            disconnect.cancel()
+            scrape_events.remove_listener(notify)
+            scrape_events.close_subscription()
+
+
+application = AsgiApplication(flask_app)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("asgi:application", host="0.0.0.0", port=8000, workers=4)
@@ -0,0 +1,191 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from common.db import READER_PRAGMAS, connect_reader
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection frees up within the pool timeout."""
+
+
+class ConnectionPool:
+    """Fixed-size pool of pre-warmed, read-only connections to one SQLite file."""
+
+    def __init__(self, db_path, size=4, timeout=10.0, pragmas=None):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = READER_PRAGMAS if pragmas is None else pragmas
+        # LIFO so the hottest connection (warmest page cache) is handed out first
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._peak_in_use = 0
+        self._acquired = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+
+    def _connect(self):
+        """Open a read-only connection, apply pragmas and load the schema."""
+        conn = connect_reader(self.db_path, self.pragmas)
+        # Parse the schema now so the first request doesn't pay for it
+        conn.execute("SELECT name FROM sqlite_master").fetchall()
+        return conn
+
+    def warm(self):
+        """Open connections until the pool is full."""
+        while True:
+            with self._lock:
+                if self._created >= self.size:
+                    return
+                self._created += 1
+            try:
+                self._idle.put(self._connect())
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+    def acquire(self):
+        """Check out a connection, opening a new one while the pool isn't full."""
+        grow = False
+        with self._lock:
+            self._acquired += 1
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = None
+                if self._created < self.size:
+                    self._created += 1
+                    grow = True
+                else:
+                    self._waits += 1
+
+        if conn is None and grow:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        elif conn is None:
+            started = time.perf_counter()
+            try:
+                conn = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                with self._lock:
+                    self._timeouts += 1
+                raise PoolTimeout(f"No free connection to {self.db_path} after {self.timeout}s")
+            finally:
+                with self._lock:
+                    self._wait_time += time.perf_counter() - started
+
+        with self._lock:
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool."""
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """Close all idle connections."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    def generation(self):
+        """Cheap change token: (mtime, size) of the database file and its WAL, no query needed."""
+        token = []
+        for path in (self.db_path, self.db_path + "-wal"):
+            try:
+                st = os.stat(path)
+                token.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                token.append(None)
+        return tuple(token)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._created,
+                "in_use": self._in_use,
+                "idle": self._created - self._in_use,
+                "peak_in_use": self._peak_in_use,
+                "acquired": self._acquired,
+                "waits": self._waits,
+                "wait_time_ms": round(self._wait_time * 1000, 3),
+                "timeouts": self._timeouts,
+            }
+
+
+class ExchangePools:
+    """One ConnectionPool per exchange database, created on first use."""
+
+    def __init__(self, path_for, exchanges, size=4, timeout=10.0):
+        self.path_for = path_for
+        self.exchanges = exchanges
+        self.size = size
+        self.timeout = timeout
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def get(self, exchange_name):
+        pool = self._pools.get(exchange_name)
+        if pool is not None:
+            return pool
+        if exchange_name not in self.exchanges:
+            raise ValueError(f"Unknown exchange '{exchange_name}'")
+        with self._lock:
+            pool = self._pools.get(exchange_name)
+            if pool is None:
+                pool = ConnectionPool(self.path_for(exchange_name), self.size, self.timeout)
+                self._pools[exchange_name] = pool
+        return pool
+
+    def connection(self, exchange_name):
+        return self.get(exchange_name).connection()
+
+    def generation(self, exchange_name):
+        return self.get(exchange_name).generation()
+
+    def warm(self):
+        """Fill every exchange's pool; returns {exchange: error} for the ones that failed."""
+        errors = {}
+        for exchange_name in self.exchanges:
+            try:
+                self.get(exchange_name).warm()
+            except Exception as e:
+                errors[exchange_name] = str(e)
+        return errors
+
+    def close(self):
+        with self._lock:
+            for pool in self._pools.values():
+                pool.close()
+
+    def stats(self):
+        return {name: pool.stats() for name, pool in list(self._pools.items())}
@@ -0,0 +1,193 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from common.scrape_events import read_scrape_events
+
+logger = logging.getLogger(__name__)
+
+KEEP_ALIVE = ": keep-alive\n\n"
+
+
+def format_cursor(positions):
+    """SSE event id: the last event_id delivered for every exchange, e.g. "binance=12,bybit=3,okx=7"."""
+    return ",".join(f"{exchange_name}={event_id}" for exchange_name, event_id in sorted(positions.items()))
+
+
+def parse_cursor(value):
+    """Inverse of format_cursor; None for a missing or malformed Last-Event-ID."""
+    if not value:
+        return None
+    positions = {}
+    try:
+        for part in value.split(","):
+            exchange_name, event_id = part.split("=")
+            positions[exchange_name.strip()] = int(event_id)
+    except ValueError:
+        return None
+    return positions
+
+
+class ScrapeEvent:
+    __slots__ = ("exchange", "event_id", "run_id", "fiat_currency", "created_at")
+
+    def __init__(self, exchange, event_id, run_id, fiat_currency, created_at):
+        self.exchange = exchange
+        self.event_id = event_id
+        self.run_id = run_id
+        self.fiat_currency = fiat_currency
+        self.created_at = created_at
+
+    def to_dict(self):
+        return {
+            "exchange": self.exchange,
+            "event_id": self.event_id,
+            "run_id": self.run_id,
+            "fiat_currency": self.fiat_currency,
+            "created_at": self.created_at,
+        }
+
+
+class EventBroker:
+    """Fans out the scrapers' scrape_events rows to Server-Sent Events subscribers.
+
+    A single background thread checks each exchange's generation token and
+    only queries scrape_events after a commit, however many clients listen.
+    """
+
+    def __init__(self, pools, exchanges, poll_interval=1.0, backlog=1000, heartbeat=15.0):
+        self.pools = pools
+        self.exchanges = exchanges
+        self.poll_interval = poll_interval
+        self.heartbeat = heartbeat
+        # Recent events kept for subscribers resuming with Last-Event-ID
+        self._events = deque(maxlen=backlog)
+        self._positions = {exchange_name: 0 for exchange_name in exchanges}
+        self._generations = {}
+        self._cond = threading.Condition()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._listeners = []
+        self.subscribers = 0
+        self.published = 0
+        # Client reconnect delay announced in the stream
+        self.retry_ms = int(poll_interval * 5000)
+
+    def start(self):
+        """Load recent events and start polling; called on the first subscription."""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self.poll(initial=True)
+            self._thread = threading.Thread(target=self._run, name="scrape-events", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            self.poll()
+
+    def poll(self, initial=False):
+        new_events = []
+        for exchange_name in self.exchanges:
+            try:
+                generation = self.pools.generation(exchange_name)
+                if self._generations.get(exchange_name) == generation:
+                    continue
+                with self.pools.connection(exchange_name) as conn:
+                    if initial:
+                        rows = read_scrape_events(conn, limit=self._events.maxlen // len(self.exchanges))
+                    else:
+                        rows = read_scrape_events(conn, self._positions[exchange_name])
+                self._generations[exchange_name] = generation
+            except Exception as e:
+                logger.warning(f"Could not read scrape events for {exchange_name}: {e}")
+                continue
+            new_events.extend(ScrapeEvent(exchange_name, *row) for row in rows)
+
+        if not new_events:
+            return
+        with self._cond:
+            for event in new_events:
+                self._events.append(event)
+                self._positions[event.exchange] = max(self._positions[event.exchange], event.event_id)
+            if initial:
+                return
+            self.published += len(new_events)
+            self._cond.notify_all()
+            listeners = list(self._listeners)
+        for callback in listeners:
+            callback()
+
+    def _pending(self, positions):
+        return [event for event in self._events if event.event_id > positions.get(event.exchange, 0)]
+
+    def open_subscription(self, last_event_id=None):
+        """Starting positions for a new subscriber; pair with close_subscription.
+
+        Without a Last-Event-ID only events from now on are sent; with one,
+        anything after it that is still in the backlog is replayed first.
+        """
+        self.start()
+        with self._cond:
+            positions = dict(self._positions)
+            resume_from = parse_cursor(last_event_id)
+            if resume_from is not None:
+                positions.update((name, event_id) for name, event_id in resume_from.items() if name in positions)
+            self.subscribers += 1
+        return positions
+
+    def close_subscription(self):
+        with self._cond:
+            self.subscribers -= 1
+
+    def drain(self, positions, exchanges=None, fiats=None):
+        """SSE messages for the events after positions (advanced in place), optionally filtered."""
+        with self._cond:
+            pending = self._pending(positions)
+
+        messages = []
+        for event in pending:
+            positions[event.exchange] = event.event_id
+            if exchanges and event.exchange not in exchanges:
+                continue
+            if fiats and event.fiat_currency is not None and event.fiat_currency not in fiats:
+                continue
+            # "scrape" when a fiat's data changed, "run" when a whole run (and its logs row) is done
+            event_type = "run" if event.fiat_currency is None else "scrape"
+            messages.append(f"id: {format_cursor(positions)}\nevent: {event_type}\ndata: {json.dumps(event.to_dict())}\n\n")
+        return messages
+
+    def add_listener(self, callback):
+        """Call callback() from the polling thread whenever new events arrive (used by async subscribers)."""
+        with self._cond:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self._cond:
+            self._listeners.remove(callback)
+
+    def subscribe(self, last_event_id=None, exchanges=None, fiats=None):
+        """Blocking generator of SSE messages for new scrape events, for threaded servers."""
+        positions = self.open_subscription(last_event_id)
+        try:
+            yield f"retry: {self.retry_ms}\n\n"
+            while True:
+                with self._cond:
+                    if not self._pending(positions):
+                        self._cond.wait(self.heartbeat)
+                messages = self.drain(positions, exchanges, fiats)
+                # Comment line keeps proxies from closing an idle connection
+                yield "".join(messages) if messages else KEEP_ALIVE
+        finally:
+            self.close_subscription()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "subscribers": self.subscribers,
+                "published": self.published,
+                "backlog": len(self._events),
+                "positions": dict(self._positions),
+            }
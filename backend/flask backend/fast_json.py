@@ -0,0 +1,33 @@
+import json
+from flask.json.provider import DefaultJSONProvider
+
+# orjson is optional; without it everything goes through the stdlib encoder
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj, sort_keys=False, default=None):
+    """Compact JSON as bytes, using orjson when it is installed."""
+    if orjson is not None:
+        option = orjson.OPT_PASSTHROUGH_DATETIME
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits or non-string keys
+            pass
+    return json.dumps(obj, sort_keys=sort_keys, default=default, separators=(",", ":")).encode()
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """jsonify() through orjson for compact responses; pretty-printed (debug) output is left to the stdlib."""
+
+    def response(self, *args, **kwargs):
+        if orjson is None or (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = dumps(obj, sort_keys=self.sort_keys, default=self.default)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
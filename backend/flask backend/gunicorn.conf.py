@@ -0,0 +1,23 @@
+# Production launch profile for the ASGI app: gunicorn -c gunicorn.conf.py
+# Requires gunicorn and uvicorn. Every worker process has its own connection
+# pools, caches and scrape event poller.
+import multiprocessing
+
+wsgi_app = "asgi:application"
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = "0.0.0.0:8000"
+
+# Requests are mostly sqlite reads on a thread pool inside each worker, so a
+# worker per core is enough; more processes only multiply idle connections.
+workers = multiprocessing.cpu_count()
+
+# Recycle workers now and then to bound memory held by snapshot and response caches
+max_requests = 10000
+max_requests_jitter = 1000
+
+# SSE clients stay connected; give them time to be closed cleanly on reload
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
@@ -0,0 +1,35 @@
+from fast_json import dumps
+
+# Rows fetched from the cursor and encoded per yielded chunk
+BATCH_SIZE = 500
+
+
+def iter_batches(cursor, batch_size=BATCH_SIZE):
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+
+def stream_json_array(batches, format_row):
+    """Encode batches of rows as one JSON array, yielding a fragment per batch."""
+    yield b"["
+    separator = b""
+    for rows in batches:
+        yield separator + b",".join(dumps(format_row(row)) for row in rows)
+        separator = b","
+    yield b"]"
+
+
+def stream_query(pool, query, params, row_formatter, batch_size=BATCH_SIZE):
+    """Run a query on a pooled connection and stream its rows as a JSON array.
+
+    row_formatter(conn, columns) returns the function that turns one row into
+    a JSON-serializable value. The connection is held until the stream ends or
+    the client disconnects.
+    """
+    with pool.connection() as conn:
+        cursor = conn.execute(query, params)
+        format_row = row_formatter(conn, [column[0] for column in cursor.description])
+        yield from stream_json_array(iter_batches(cursor, batch_size), format_row)
@@ -0,0 +1,81 @@
+import json
+import os
+import threading
+import time
+
+
+class ExchangeReference:
+    """One exchange's fiat2country.json plus a case-insensitive country -> fiat index."""
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime_ns = None
+        self.fiat_to_country = {}
+        self.country_to_fiat = {}
+
+    def load(self):
+        mtime_ns = os.stat(self.path).st_mtime_ns
+        with open(self.path, "r") as f:
+            fiat_to_country = json.load(f)
+
+        # First fiat wins when two fiats map to the same country, as the old linear scan did
+        country_to_fiat = {}
+        for fiat, country in fiat_to_country.items():
+            country_to_fiat.setdefault(country.lower(), fiat)
+
+        # Swap in whole dicts so concurrent readers never see a half-built index
+        self.fiat_to_country = fiat_to_country
+        self.country_to_fiat = country_to_fiat
+        self.mtime_ns = mtime_ns
+
+
+class ReferenceData:
+    """Per-process registry of fiat2country mappings, reloaded when a file's mtime changes."""
+
+    def __init__(self, path_for, exchanges, check_interval=1.0):
+        self.path_for = path_for
+        self.exchanges = exchanges
+        # Seconds between mtime checks, so lookups normally skip the stat() call
+        self.check_interval = check_interval
+        self._refs = {}
+        self._checked_at = {}
+        self._lock = threading.Lock()
+
+    def load_all(self):
+        """Load every exchange's mapping; returns {exchange: error} for the ones that failed."""
+        errors = {}
+        for exchange_name in self.exchanges:
+            try:
+                self.get(exchange_name)
+            except Exception as e:
+                errors[exchange_name] = str(e)
+        return errors
+
+    def get(self, exchange_name):
+        ref = self._refs.get(exchange_name)
+        now = time.monotonic()
+        if ref is not None and now - self._checked_at.get(exchange_name, 0.0) < self.check_interval:
+            return ref
+        if exchange_name not in self.exchanges:
+            raise ValueError(f"Unknown exchange '{exchange_name}'")
+
+        with self._lock:
+            ref = self._refs.get(exchange_name)
+            if ref is None:
+                ref = ExchangeReference(self.path_for(exchange_name))
+                ref.load()
+                self._refs[exchange_name] = ref
+            elif os.stat(ref.path).st_mtime_ns != ref.mtime_ns:
+                ref.load()
+            self._checked_at[exchange_name] = now
+        return ref
+
+    def fiat_to_country(self, exchange_name):
+        return self.get(exchange_name).fiat_to_country
+
+    def fiat_for_country(self, exchange_name, country):
+        """Fiat table name for a country (case-insensitive), or None."""
+        return self.get(exchange_name).country_to_fiat.get(country.lower())
+
+    def country_for_fiat(self, exchange_name, fiat):
+        return self.get(exchange_name).fiat_to_country.get(fiat.upper())
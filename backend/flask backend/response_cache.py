@@ -0,0 +1,192 @@
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import Response, request, make_response
+from compression import COMPRESS_MIN_BYTES, negotiate_encoding, compress
+
+
+def etag_for(key, generation, encoding=None):
+    """Strong ETag for a cache key at a database generation, distinct per content-coding."""
+    if encoding is None:
+        return hashlib.sha1(repr((key, generation)).encode()).hexdigest()
+    return hashlib.sha1(repr((key, generation, encoding)).encode()).hexdigest()
+
+
+def with_etag(response, etag):
+    response.set_etag(etag)
+    # Let browsers keep the body but revalidate on every use
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def precompressed(response, **encoded):
+    """Attach ready-made compressed variants of a view's body (e.g. gzip=...) for the cache to store."""
+    response.encoded_variants = encoded
+    return response
+
+
+# Headers the cache rebuilds itself instead of storing
+UNCACHED_HEADERS = {"Content-Type", "Content-Length", "ETag", "Cache-Control", "Content-Encoding", "Vary"}
+
+
+class CacheEntry:
+    __slots__ = ("generation", "body", "status", "mimetype", "headers", "encoded")
+
+    def __init__(self, generation, body, status, mimetype, headers):
+        self.generation = generation
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        # Extra headers set by the view, e.g. pagination cursors
+        self.headers = headers
+        # Compressed variants of body by content-coding, filled on first request for each
+        self.encoded = {}
+
+    def size(self):
+        return len(self.body) + sum(len(body) for body in self.encoded.values())
+
+
+class ResponseCache:
+    """Bounded LRU cache of serialized responses, each valid for one database generation."""
+
+    def __init__(self, generation_for, max_entries=256, max_bytes=64 * 1024 * 1024):
+        # generation_for(exchange_name) -> token that changes whenever a scraper commits
+        self.generation_for = generation_for
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, key, generation):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.generation != generation:
+                # A scraper committed since this was cached
+                self._remove(key)
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, generation, body, status, mimetype, headers=(), encoded=None):
+        entry = CacheEntry(generation, body, status, mimetype, headers)
+        if encoded:
+            entry.encoded.update(encoded)
+        if entry.size() > self.max_bytes:
+            return entry
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size()
+            self._evict()
+        return entry
+
+    def encoded_body(self, key, entry, encoding):
+        """entry's body in the given content-coding, compressed once and kept with the entry."""
+        if encoding is None:
+            return entry.body
+        body = entry.encoded.get(encoding)
+        if body is not None:
+            return body
+
+        body = compress(entry.body, encoding)
+        with self._lock:
+            # Only account for it if the entry is still cached and nobody beat us to it
+            if self._entries.get(key) is entry and encoding not in entry.encoded:
+                entry.encoded[encoding] = body
+                self._bytes += len(body)
+                self._evict()
+        return body
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def cached(self, default_exchange=None, exchanges=None):
+        """Decorator for GET views whose output depends only on the query args and the database.
+
+        Responses carry a strong ETag derived from the generation, so a client
+        revalidating with If-None-Match gets a 304 without a database read.
+        Bodies are compressed for the negotiated content-coding once per entry.
+        Views reading several databases pass them as exchanges; their entries
+        are invalidated when any of them changes.
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                exchange_name = None if exchanges else request.args.get("exchange", default_exchange)
+                try:
+                    if exchanges:
+                        generation = tuple(self.generation_for(name) for name in exchanges)
+                    else:
+                        generation = self.generation_for(exchange_name)
+                except ValueError:
+                    # Unknown exchange: let the view produce its usual error
+                    return view(*args, **kwargs)
+
+                key = (exchange_name, request.endpoint, tuple(sorted(request.args.items(multi=True))))
+                encoding = negotiate_encoding()
+                # Small bodies go out uncompressed, so the client may hold either variant
+                for candidate in {encoding, None}:
+                    etag = etag_for(key, generation, candidate)
+                    if request.if_none_match.contains(etag):
+                        response = with_etag(Response(status=304), etag)
+                        response.vary.add("Accept-Encoding")
+                        return response
+
+                entry = self.get(key, generation)
+                if entry is None:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    if response.is_streamed:
+                        # Not stored; the compress_response hook encodes it on the way out
+                        return with_etag(response, etag_for(key, generation, encoding))
+                    headers = [(k, v) for k, v in response.headers.items() if k not in UNCACHED_HEADERS]
+                    encoded = getattr(response, "encoded_variants", None)
+                    entry = self.put(key, generation, response.get_data(), response.status_code, response.mimetype, headers, encoded)
+
+                if len(entry.body) < COMPRESS_MIN_BYTES:
+                    encoding = None
+                response = Response(self.encoded_body(key, entry, encoding), status=entry.status, mimetype=entry.mimetype, headers=entry.headers)
+                if encoding is not None:
+                    response.headers["Content-Encoding"] = encoding
+                response.vary.add("Accept-Encoding")
+                return with_etag(response, etag_for(key, generation, encoding))
+            return wrapper
+        return decorator
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,30 @@
+import threading
+from common.snapshots import FiatSnapshot
+
+
+class SnapshotCache:
+    """FiatSnapshots per (exchange, fiat), rebuilt only when the database generation changes."""
+
+    def __init__(self, pools):
+        self.pools = pools
+        self._snapshots = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def get(self, exchange_name, fiat_currency):
+        # Read the generation before the data, so a commit landing in between is picked up on the next call
+        generation = self.pools.generation(exchange_name)
+        key = (exchange_name, fiat_currency)
+        entry = self._snapshots.get(key)
+        if entry is not None and entry[0] == generation:
+            return entry[1]
+
+        with self.pools.connection(exchange_name) as conn:
+            snapshot = FiatSnapshot.from_table(conn, fiat_currency)
+        with self._lock:
+            self._snapshots[key] = (generation, snapshot)
+            self.builds += 1
+        return snapshot
+
+    def stats(self):
+        return {"snapshots": len(self._snapshots), "builds": self.builds}
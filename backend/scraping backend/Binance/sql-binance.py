@@ -7,7 +7,21 @@ from selenium.webdriver.firefox.options import Options
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import sqlite3
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from common.payment_index import MethodIndex, save_method_index
+from common.snapshots import FiatSnapshot
+from common.dashboard_store import create_dashboard_tables, start_run, finish_run, save_payment_method_stats, clear_payment_method_stats, save_dashboard_document, migrate_spread_column
+from common.scrape_events import create_scrape_events_table, emit_scrape_event
+from common.exchange_summary import create_summary_tables, rebuild_exchange_summary, add_fiat_to_summary, remove_fiat_from_summary
+from common.dashboard_history import create_dashboard_history_table, record_dashboard_history
+from common.liquidity_logs import create_liquidity_logs_tables, save_liquidity_logs, migrate_wide_logs
+from common.price_distribution import create_price_distribution_table, price_distributions, save_price_distributions, clear_price_distributions
+from common.db import connect_writer, CheckpointScheduler
+from common.staging import create_staging_table, swap_in_staging, bulk_insert_ads, rows_per_second
+
+DB_PATH = "C:\\Users\\kapse\\Desktop\\Pythonproject\\Archive\\database\\binance_data.db"
 # List of fiat currencies
 fiat_currencies = [
     "AED", "AMD", "AOA", "ARS", "AUD", "AZN", "BDT", "BHD", "BIF", "BND",
@@ -184,7 +198,7 @@ def click_element(driver, xpath):
         print(f"Error occurred while locating element: {e}")
 
 def create_database_and_tables():
-    conn = sqlite3.connect("C:\\Users\\kapse\\Desktop\\Pythonproject\\Archive\\database\\binance_data.db")
+    conn = connect_writer(DB_PATH)
     cursor = conn.cursor()
 
     # Create Dashboard table
@@ -202,78 +216,52 @@ def create_database_and_tables():
             PRIMARY KEY (fiat_currency, date_time)
         )
     """)
+    create_dashboard_tables(cursor)
+    create_scrape_events_table(cursor)
+    migrate_spread_column(cursor)
+    create_summary_tables(cursor)
+    rebuild_exchange_summary(cursor)
+    create_dashboard_history_table(cursor)
+    create_liquidity_logs_tables(cursor)
+    create_price_distribution_table(cursor)
 
     conn.commit()
     return conn, cursor
 def save_data_to_db(cursor, fiat_currency, advertisers, prices, available_amounts, payment_methods, timestamps):
-    # Create table for the specific fiat currency if it doesn't exist
-    cursor.execute(f"""
-    CREATE TABLE IF NOT EXISTS {fiat_currency} (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        advertiser_name TEXT,
-        price REAL,
-        available_amount REAL,
-        payment_methods TEXT,
-        timestamp TEXT
-    )
-    """)
+    # New ads go to a staging table; swap_in_staging() publishes them together with the dashboard row
+    staging = create_staging_table(cursor, fiat_currency)
 
-    # Insert data into the currency table
-    for i in range(len(advertisers)):
-        cursor.execute(f"""
-        INSERT INTO {fiat_currency} (advertiser_name, price, available_amount, payment_methods, timestamp)
-        VALUES (?, ?, ?, ?, ?)
-        """, (advertisers[i], prices[i], available_amounts[i], payment_methods[i], timestamps[i]))
-
-def process_payment_methods(prices, available_amounts, payment_methods):
-    payment_dict = {}
-    payment_vwap = {}
-
-    for i, methods in enumerate(payment_methods):
-        price = prices[i]
-        amount = available_amounts[i]
-        counted_bank = False
-
-        for method in methods.split(","):
-            method = method.strip()
-
-            # Aggregate all methods with "bank" into "Bank Transfer"
-            if "bank" in method.lower():
-                if not counted_bank:
-                    method_key = "Bank Transfer"
-                    payment_dict[method_key] = payment_dict.get(method_key, 0) + amount
-                    payment_vwap[method_key] = payment_vwap.get(method_key, 0) + price * amount
-                    counted_bank = True
-            else:
-                # Add the amount and calculate VWAP for other methods
-                if method:
-                    payment_dict[method] = payment_dict.get(method, 0) + amount
-                    payment_vwap[method] = payment_vwap.get(method, 0) + price * amount
-
-    # Final VWAP calculations
-    for method in payment_dict:
-        if payment_dict[method] > 0:
-            payment_vwap[method] = payment_vwap[method] / payment_dict[method]
-        else:
-            payment_vwap[method] = 0
+    # Index this fiat's payment methods so the API can filter ads by bitmask
+    method_index = MethodIndex.build(payment_methods)
+
+    # Ads repeat a handful of method strings, so encode each distinct one once
+    masks = {methods: method_index.encode_blob(methods) for methods in set(payment_methods)}
 
-    # Format the payment methods string
-    sorted_methods = sorted(payment_dict.items(), key=lambda x: x[1], reverse=True)
+    # One executemany over all ads; the caller's commit makes it a single transaction
+    records = zip(advertisers, prices, available_amounts, payment_methods, timestamps, map(masks.__getitem__, payment_methods))
+    rows, seconds = bulk_insert_ads(cursor, staging, records)
+    print(f"Staged {rows} ads for {fiat_currency} in {seconds * 1000:.1f} ms ({rows_per_second(rows, seconds):,.0f} rows/sec)")
+
+    return method_index
+
+def process_payment_methods(snapshot):
+    # Per-method liquidity and VWAP, largest first ("bank" methods are folded into "Bank Transfer")
     formatted_payment_methods = ", ".join(
         f"{method} ({amount:.2f}) ({vwap:.2f})"
-        for method, amount, vwap in sorted([(k, payment_dict[k], payment_vwap[k]) for k in payment_dict], key=lambda x: x[1], reverse=True)
+        for method, amount, vwap in snapshot.per_method()
     )
 
     return formatted_payment_methods
 
 
-def update_dashboard(cursor, fiat_currency, advertisers, available_amounts, prices, exchange_rate, payment_methods):
-    total_available_amount = sum(available_amounts)
-    weighted_sum = sum(price * amt for price, amt in zip(prices, available_amounts))
-    vw_price = weighted_sum / total_available_amount if total_available_amount > 0 else 0
+def update_dashboard(cursor, run_id, fiat_currency, advertisers, available_amounts, prices, exchange_rate, payment_methods):
+    # Columnar snapshot of this fiat's ads; every aggregate below is a vectorized reduction
+    snapshot = FiatSnapshot.from_lists(prices, available_amounts, payment_methods)
+    total_available_amount = snapshot.total_liquidity()
+    vw_price = snapshot.vwap()
 
     # Process and format payment methods with VWAP
-    payment_methods_str = process_payment_methods(prices, available_amounts, payment_methods)
+    payment_methods_str = process_payment_methods(snapshot)
 
     # Define country and current timestamp
     with open('C:\\Users\\kapse\\Desktop\\Pythonproject\\Archive\\Binance\\fiat2country.json', 'r') as file:
@@ -281,8 +269,8 @@ def update_dashboard(cursor, fiat_currency, advertisers, available_amounts, pric
     country = fiat_to_country.get(fiat_currency.upper())
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    # Calculate spread
-    spread = f"{abs((exchange_rate / vw_price - 1) * 100):.2f}%" if vw_price > 0 else "0.00%"
+    # Calculate spread (percent, stored as a number; clients format it)
+    spread = abs((exchange_rate / vw_price - 1) * 100) if vw_price > 0 else 0.0
 
     advertiser_count = len(advertisers)
 
@@ -295,60 +283,31 @@ def update_dashboard(cursor, fiat_currency, advertisers, available_amounts, pric
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
     """, (country, fiat_currency, timestamp, total_available_amount, vw_price, exchange_rate, spread, payment_methods_str, advertiser_count))
 
-def clear_table_for_fiat(cursor, fiat_currency):
-    try:
-        """Clear the table for a specific fiat currency."""
-        cursor.execute(f"DELETE FROM {fiat_currency}")
-        print(f"Cleared existing data in {fiat_currency} table.")
-    except Exception as E:
-        print(E)
+    # Normalized per-method breakdown, read by the API instead of parsing payment_methods_str
+    save_payment_method_stats(cursor, fiat_currency, run_id, snapshot.per_method())
+    # Price quantiles and histograms, overall and per method, for /api/distribution
+    save_price_distributions(cursor, fiat_currency, run_id, price_distributions(snapshot))
+    add_fiat_to_summary(cursor, fiat_currency)
+    record_dashboard_history(cursor, run_id, fiat_currency)
 
 def clear_dashboard_for_fiat(cursor, fiat_currency):
     """Clear the dashboard for a specific fiat currency."""
+    remove_fiat_from_summary(cursor, fiat_currency)
     cursor.execute(f"DELETE FROM dashboard WHERE fiat_currency = ?", (fiat_currency,))
+    clear_payment_method_stats(cursor, fiat_currency)
+    clear_price_distributions(cursor, fiat_currency)
     print(f"Cleared existing data for {fiat_currency} in the dashboard.")
 
 
-def update_logs_table(cursor, fiat_to_country, processed_data):
+def update_logs_table(cursor, run_id, processed_data):
     """
-    Batch update logs table with data from all processed fiats.
+    Log the liquidity of every fiat processed in this run.
     :param cursor: SQLite cursor object
-    :param fiat_to_country: Mapping of fiat currencies to country names
+    :param run_id: Scrape run the values belong to
     :param processed_data: Dictionary containing fiat_currency and total_liquidity
     """
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    # Prepare a row with all country names set to 0 initially
-    logs_data = {country: 0 for country in fiat_to_country.values()}
-
-    # Map processed data to country names
-    for fiat, liquidity in processed_data.items():
-        country = fiat_to_country.get(fiat)
-        if country:
-            logs_data[country] = liquidity
-
-    # Escape column names with double quotes
-    columns = ["timestamp"] + [f'"{country}"' for country in logs_data.keys()]  # Add "timestamp" explicitly
-    values = [timestamp] + list(logs_data.values())  # Add timestamp as the first value
-
-    # Check if the number of values matches the number of columns
-    print(f"Number of columns: {len(columns)}")
-    print(f"Number of values: {len(values)}")
-
-    # Check if a log already exists for this timestamp
-    cursor.execute("SELECT timestamp FROM logs WHERE timestamp = ?", (timestamp,))
-    existing_log = cursor.fetchone()
-
-    if not existing_log:
-        # Insert a new row with the timestamp and all country data
-        placeholders = ", ".join(["?"] * len(columns))
-        cursor.execute(f"""
-            INSERT INTO logs ({', '.join(columns)})
-            VALUES ({placeholders})
-        """, values)
-    else:
-        print(f"Logs for timestamp {timestamp} already exist. Skipping insertion.")
-
+    save_liquidity_logs(cursor, run_id, timestamp, processed_data)
     print(f"Logs updated for timestamp {timestamp}.")
 
 
@@ -363,14 +322,19 @@ def main():
     driver = webdriver.Firefox(service=service, options=options)
 
     conn, cursor = create_database_and_tables()
+    # Keep the WAL short while fiats are being written
+    checkpoints = CheckpointScheduler(DB_PATH).start()
+    run_id = start_run(cursor)
+    conn.commit()
     processed_data = {}  # To store liquidity data for logs
 
     with open('C:\\Users\\kapse\\Desktop\\Pythonproject\\Archive\\Binance\\fiat2country.json', 'r') as file:
         fiat_to_country = json.load(file)
+    # Copies the old one-column-per-country logs over on the first run
+    migrate_wide_logs(cursor, fiat_to_country)
+    conn.commit()
     
     for fiat_currency in fiat_currencies:
-        clear_table_for_fiat(cursor, fiat_currency)
-        clear_dashboard_for_fiat(cursor, fiat_currency)
         # Print the message before scraping
         print(f"Scraping {fiat_currency}...")
 
@@ -380,8 +344,9 @@ def main():
 # Handle pagination and data extraction
         advertisers, prices, available_amounts, payment_methods, timestamps = paginate_and_load_pages(driver)
             
-            # Save scraped data to the database
-        save_data_to_db(cursor, fiat_currency, advertisers, prices, available_amounts, payment_methods, timestamps)
+        # Stage the new ads; readers keep seeing the previous snapshot meanwhile
+        method_index = save_data_to_db(cursor, fiat_currency, advertisers, prices, available_amounts, payment_methods, timestamps)
+        conn.commit()
 
         # Update the dashboard with aggregated data
                 # Load exchange rates
@@ -392,13 +357,24 @@ def main():
         else:
             new_fiat_currency = f'USD{fiat_currency}'
             exchange_rate = data["quotes"].get(new_fiat_currency)
-            
-        update_dashboard(cursor, fiat_currency, advertisers, available_amounts, prices, exchange_rate, payment_methods)
+
+        # Publish in one short transaction: table swap, method index, dashboard row, event and document
+        swap_in_staging(cursor, fiat_currency)
+        save_method_index(cursor, fiat_currency, method_index)
+        clear_dashboard_for_fiat(cursor, fiat_currency)
+        update_dashboard(cursor, run_id, fiat_currency, advertisers, available_amounts, prices, exchange_rate, payment_methods)
         
         processed_data[fiat_currency] = sum(available_amounts)
-
-    update_logs_table(cursor, fiat_to_country, processed_data)    
+        emit_scrape_event(cursor, run_id, fiat_currency)
+        # Ready-to-serve /api/dashboard response matching this commit
+        save_dashboard_document(cursor, run_id)
+        conn.commit()
+
+    update_logs_table(cursor, run_id, processed_data)    
+    finish_run(cursor, run_id)
+    emit_scrape_event(cursor, run_id)
     conn.commit()
+    checkpoints.stop()
 
     driver.quit()
     conn.close()
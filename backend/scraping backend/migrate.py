@@ -0,0 +1,55 @@
+"""Bring existing exchange databases up to the current schema without scraping.
+
+    python migrate.py              (all three exchanges)
+    python migrate.py okx bybit    (some of them)
+
+The scrapers run the same migrations when they start.
+"""
+import json
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.dashboard_store import create_dashboard_tables, migrate_spread_column
+from common.scrape_events import create_scrape_events_table
+from common.exchange_summary import create_summary_tables, rebuild_exchange_summary
+from common.dashboard_history import create_dashboard_history_table
+from common.liquidity_logs import create_liquidity_logs_tables, migrate_wide_logs
+from common.price_distribution import create_price_distribution_table
+from common.db import connect_writer
+
+# Database and fiat2country.json of each scraper
+DATABASES = {
+    "binance": ("C:\\Users\\kapse\\Desktop\\Pythonproject\\Archive\\database\\binance_data.db",
+                "C:\\Users\\kapse\\Desktop\\Pythonproject\\Archive\\Binance\\fiat2country.json"),
+    "bybit": ("C:\\Users\\kapse\\Desktop\\Pythonproject\\Archive\\database\\bybit_data.db",
+              "C:\\Users\\kapse\\Desktop\\Pythonproject\\Archive\\Bybit\\fiat2country.json"),
+    "okx": ("C:\\Users\\kapse\\Desktop\\Pythonproject\\Archive\\database\\okx_data.db",
+            "C:\\Users\\kapse\\Desktop\\Pythonproject\\Archive\\okx\\fiat2country.json"),
+}
+
+
+def migrate(db_path, mapping_path):
+    with open(mapping_path, 'r') as file:
+        fiat_to_country = json.load(file)
+
+    conn = connect_writer(db_path)
+    try:
+        cursor = conn.cursor()
+        create_dashboard_tables(cursor)
+        create_scrape_events_table(cursor)
+        converted = migrate_spread_column(cursor)
+        create_summary_tables(cursor)
+        rebuild_exchange_summary(cursor)
+        create_dashboard_history_table(cursor)
+        create_liquidity_logs_tables(cursor)
+        create_price_distribution_table(cursor)
+        copied = migrate_wide_logs(cursor, fiat_to_country)
+        conn.commit()
+        print(f"{db_path}: converted {converted} spread values, copied {copied} log rows")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    for exchange_name in sys.argv[1:] or DATABASES:
+        migrate(*DATABASES[exchange_name])
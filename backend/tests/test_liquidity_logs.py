@@ -0,0 +1,62 @@
+import os
+import sqlite3
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.dashboard_store import create_dashboard_tables
+from common.liquidity_logs import create_liquidity_logs_tables, migrate_wide_logs, read_liquidity_logs, read_liquidity_series, rollup_bucket
+
+FIAT_TO_COUNTRY = {"INR": "India", "BRL": "Brazil"}
+
+
+def wide_logs_db():
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.cursor()
+    create_dashboard_tables(cursor)
+    create_liquidity_logs_tables(cursor)
+    cursor.execute("CREATE TABLE logs (timestamp TEXT, India REAL, Brazil REAL)")
+    # Older Binance rows were written without zero padding
+    cursor.executemany("INSERT INTO logs VALUES (?, ?, ?)", [
+        ("2024-09-28 2:21:26", 100.0, 0),
+        ("2024-09-28 02:50:00", 300.0, 50.0),
+        ("2024-09-28 13:05:00", 200.0, 70.0),
+    ])
+    return conn, cursor
+
+
+def test_migrate_wide_logs_normalizes_unpadded_timestamps():
+    conn, cursor = wide_logs_db()
+    assert migrate_wide_logs(cursor, FIAT_TO_COUNTRY) == 3
+
+    timestamps = [timestamp for (timestamp,) in conn.execute("SELECT timestamp FROM log_runs ORDER BY timestamp")]
+    assert timestamps == ["2024-09-28 02:21:26", "2024-09-28 02:50:00", "2024-09-28 13:05:00"]
+    buckets = {bucket for (bucket,) in conn.execute("SELECT bucket FROM liquidity_rollups WHERE bucket_seconds = 3600")}
+    assert buckets == {"2024-09-28 02:00:00", "2024-09-28 13:00:00"}
+
+    # Already copied rows are recognized by their normalized timestamp
+    assert migrate_wide_logs(cursor, FIAT_TO_COUNTRY) == 0
+
+
+def test_sub_hour_series_after_migrating_unpadded_timestamps():
+    conn, cursor = wide_logs_db()
+    migrate_wide_logs(cursor, FIAT_TO_COUNTRY)
+
+    series = read_liquidity_series(conn, 45 * 60, 10, fiats=["INR"])
+    assert series == [("2024-09-28 12:45:00", {"INR": 200.0}), ("2024-09-28 02:15:00", {"INR": 200.0})]
+    hourly = read_liquidity_series(conn, 3600, 10, fiats=["INR"], stat="max")
+    assert hourly == [("2024-09-28 13:00:00", {"INR": 200.0}), ("2024-09-28 02:00:00", {"INR": 300.0})]
+
+
+def test_migrate_wide_logs_repairs_runs_copied_unpadded():
+    conn, cursor = wide_logs_db()
+    # A run copied verbatim by an earlier version of the migration
+    cursor.execute("INSERT INTO scrape_runs (started_at, finished_at) VALUES ('2024-09-28 2:21:26', '2024-09-28 2:21:26')")
+    cursor.execute("INSERT INTO log_runs VALUES (?, '2024-09-28 2:21:26')", (cursor.lastrowid,))
+
+    assert migrate_wide_logs(cursor, FIAT_TO_COUNTRY) == 2
+    runs = read_liquidity_logs(conn, [], [], 10)
+    assert [timestamp for timestamp, _ in runs] == ["2024-09-28 13:05:00", "2024-09-28 02:50:00", "2024-09-28 02:21:26"]
+
+
+def test_rollup_bucket_parses_the_timestamp():
+    assert rollup_bucket("2024-09-28 2:21:26", 3600) == "2024-09-28 02:00:00"
+    assert rollup_bucket("2024-09-28 23:59:59", 86400) == "2024-09-28 00:00:00"
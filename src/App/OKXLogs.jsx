@@ -9,13 +9,18 @@ function LogsTable({ exchangeName }) {
   const [timestamps, setTimestamps] = useState([]);
   const [countriesData, setCountriesData] = useState({});
   const [showDashboard, setShowDashboard] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
   const webapp = 'https://hard4j.pythonanywhere.com';
 
-  useEffect(() => {
-    fetch(`${webapp}/logs?exchange=okx`)
-      .then((response) => response.json())
-      .then((data) => {
-        if (data.length > 0) {
+  // /logs returns the latest page of snapshots; X-Next-Cursor points at the next (older) page
+  const loadLogs = (cursor, append) => {
+    const url = cursor
+      ? `${webapp}/logs?exchange=okx&cursor=${encodeURIComponent(cursor)}`
+      : `${webapp}/logs?exchange=okx`;
+    fetch(url)
+      .then((response) => response.json().then((data) => {
+        setNextCursor(response.headers.get('X-Next-Cursor'));
+        if (Array.isArray(data) && data.length > 0) {
           const extractedTimestamps = data.map((log) => log.timestamp);
           const organizedCountriesData = {};
 
@@ -30,15 +35,34 @@ function LogsTable({ exchangeName }) {
             });
           });
 
-          setTimestamps(extractedTimestamps);
-          setCountriesData(organizedCountriesData);
+          if (append) {
+            setTimestamps((previous) => previous.concat(extractedTimestamps));
+            setCountriesData((previous) => {
+              const merged = { ...previous };
+              Object.keys(organizedCountriesData).forEach((key) => {
+                merged[key] = (merged[key] || []).concat(organizedCountriesData[key]);
+              });
+              return merged;
+            });
+          } else {
+            setTimestamps(extractedTimestamps);
+            setCountriesData(organizedCountriesData);
+          }
         }
-      })
+      }))
       .catch((error) => {
         console.error('Error fetching logs data:', error);
       });
+  };
+
+  useEffect(() => {
+    loadLogs(null, false);
   }, [exchangeName]);
 
+  const handleLoadOlder = () => {
+    loadLogs(nextCursor, true);
+  };
+
   const handleNavigateToDashboard = () => {
     setShowDashboard(true);
   };
@@ -86,6 +110,17 @@ function LogsTable({ exchangeName }) {
           ))}
         </TableBody>
       </Table>
+
+      {nextCursor && (
+        <div className="flex justify-center p-2">
+          <Button
+            onClick={handleLoadOlder}
+            className="dark:text-gray-300 text-gray-700 hover:text-gray-300 dark:hover:text-gray-100 font-medium"
+          >
+            Load older snapshots
+          </Button>
+        </div>
+      )}
     </div>
   );
 }
@@ -39,6 +39,51 @@ function BYBIT_Dashboard() {
         console.error('Error fetching metrics:', error);
       });
   }, []);
+
+  // Live updates: refresh a country's row when the scraper commits its fiat, and the metrics when a run finishes
+  useEffect(() => {
+    const events = new EventSource(`${webapp}/api/events?exchange=bybit`);
+
+    events.addEventListener('scrape', event => {
+      const { fiat_currency } = JSON.parse(event.data);
+      fetch(`${webapp}/api/dashboard?exchange=bybit&fiat=${fiat_currency}`)
+        .then(response => response.json())
+        .then(data => {
+          const updatedRows = data.map(row => ({
+            ...row,
+            clickedPaymentMethods: row.available_payment_methods.map(payment => payment.method),
+          }));
+          setDashboardData(prevData => {
+            const index = prevData.findIndex(row => row.fiat_currency === fiat_currency);
+            if (index === -1) {
+              return [...prevData, ...updatedRows];
+            }
+            const rest = prevData.slice(index).filter(row => row.fiat_currency !== fiat_currency);
+            return [...prevData.slice(0, index), ...updatedRows, ...rest];
+          });
+          // Selections were reset to all methods, so drop their stale liquidity figures
+          setLiquidityData(prevData => Object.fromEntries(
+            Object.entries(prevData).filter(([key]) => !updatedRows.some(row => key.startsWith(`${row.country}-`)))
+          ));
+        })
+        .catch(error => {
+          console.error('Error refreshing data:', error);
+        });
+    });
+
+    events.addEventListener('run', () => {
+      fetch(`${webapp}/calculate?exchange=bybit`)
+        .then(response => response.json())
+        .then(data => {
+          setMetrics(data);
+        })
+        .catch(error => {
+          console.error('Error fetching metrics:', error);
+        });
+    });
+
+    return () => events.close();
+  }, []);
   
   const handlePaymentMethodClick = (method, country, originalData) => {
     setDashboardData(prevData => {
@@ -201,7 +246,7 @@ function BYBIT_Dashboard() {
                   <TableCell className="dark:text-white text-black">
                     {formatNumberWithCommas(data.exchange_rate.toFixed(2))}
                   </TableCell>
-                  <TableCell className="dark:text-white text-black">{data.spread}</TableCell>
+                  <TableCell className="dark:text-white text-black">{data.spread.toFixed(2)}%</TableCell>
                   <TableCell>
                     <div className="flex flex-wrap gap-4">
                       {data.available_payment_methods.map(payment => {